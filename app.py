@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 # app.py — Pure VTK viewer; Tk is used only for folder selection dialog.
-import os, sys, glob, platform
+import os, sys, platform
 import numpy as np
-import argparse
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Simple lung HU range defaults (airy parenchyma) ---
 DEFAULT_LUNG_LOW_HU  = -950
@@ -13,9 +13,10 @@ BACKGROUND_HU        = -2000  # value used to zero-out non-lung voxels when mask
 # --- VTK required backends ---
 import vtkmodules.vtkInteractionStyle
 import vtkmodules.vtkRenderingOpenGL2
-import vtkmodules.vtkRenderingVolumeOpenGL2
+# vtkRenderingVolumeOpenGL2 (GPU volume backend) is imported in make_volume_mapper, only when a 3D view needs it
 
 from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.util import vtkConstants
 from vtkmodules.vtkCommonDataModel import vtkImageData, vtkPiecewiseFunction
 from vtkmodules.vtkRenderingCore import (
     vtkRenderer, vtkRenderWindow, vtkRenderWindowInteractor,
@@ -26,12 +27,8 @@ from vtkmodules.vtkRenderingAnnotation import vtkAxesActor
 from vtkmodules.vtkInteractionWidgets import vtkSliderRepresentation2D, vtkSliderWidget, vtkOrientationMarkerWidget
 from vtkmodules.vtkRenderingVolume import vtkFixedPointVolumeRayCastMapper
 
-
-try:
-    import pydicom
-except Exception:
-    print("pydicom が見つかりません。`pip install pydicom` を実行してください。")
-    sys.exit(1)
+# pydicom / argparse / tkinter are imported where used, so a process spawned only to
+# hand over to the Qt viewer does not pay for them
 
 # --- faulthandler guarded setup ---
 def _ensure_stdio():
@@ -52,60 +49,77 @@ except Exception:
     pass
 
 # ---------- DICOM -> NumPy (Z,Y,X) ----------
+# tags the header pass needs (PixelData only to tell images from other objects)
+# scan / two-pass read / parsed-volume cache helpers shared with app_qt.py and dicom_io.py
+from series_utils import (walk_files, is_dicom, read_header, read_pixels, cache_enabled, cache_key,
+                          load_cached_volume, save_cached_volume, histogram_percentiles)
+
+# namespace of this loader's entries in the per-user volume cache (series_utils.cache_dir())
+CACHE_NAMESPACE = "vtk"
+
 def load_dicom_series(dcm_dir: str):
-    files = sorted(glob.glob(os.path.join(dcm_dir, "**", "*.dcm"), recursive=True))
+    all_files = sorted(walk_files(dcm_dir))
+    files = [f for f in all_files if f.endswith(".dcm")]
     if not files:
-        files = sorted(glob.glob(os.path.join(dcm_dir, "**", "*"), recursive=True))
-        files = [f for f in files if os.path.isfile(f)]
+        # no extension: drop non-DICOM by magic bytes (all of them kept if none match,
+        # so preamble-less files that dcmread(force=True) accepts still load)
+        files = [f for f in all_files if is_dicom(f)] or all_files
     if not files:
         raise RuntimeError(f"DICOM 候補ファイルが見つかりません: {dcm_dir}")
 
-    slices, zpos = [], []
-    spacing, origin = None, (0.0, 0.0, 0.0)
-
-    for fp in files:
-        try:
-            ds = pydicom.dcmread(fp, force=True, stop_before_pixels=False)
-        except Exception:
-            continue
-        if not hasattr(ds, "PixelData"):
-            continue
-
-        arr = ds.pixel_array
-        slope = float(getattr(ds, "RescaleSlope", 1.0))
-        intercept = float(getattr(ds, "RescaleIntercept", 0.0))
-        arr = (arr.astype(np.float32) * slope + intercept).astype(np.int16)
-
-        if spacing is None:
-            try:
-                py, px = [float(x) for x in ds.PixelSpacing]
-                pz = float(getattr(ds, "SliceThickness", 1.0))
-                spacing = (pz, py, px)  # (Z,Y,X)
-            except Exception:
-                spacing = (1.0, 1.0, 1.0)
-            try:
-                ipp = [float(v) for v in ds.ImagePositionPatient]
-                origin = (ipp[0], ipp[1], ipp[2])
-            except Exception:
-                origin = (0.0, 0.0, 0.0)
-
-        try:
-            ipp = [float(v) for v in ds.ImagePositionPatient]
-            z = ipp[2]
-        except Exception:
-            try:
-                z = float(ds.SliceLocation)
-            except Exception:
-                z = len(slices)
-
-        slices.append(arr)
-        zpos.append(z)
-
-    if not slices:
-        raise RuntimeError("有効な DICOM スライスがありません。")
+    # key None: caching off, or a file vanished since the walk (read this load uncached)
+    key = cache_key(files) if cache_enabled() else None
+    if key is not None:
+        cached = load_cached_volume(dcm_dir, CACHE_NAMESPACE, key)
+        if cached is not None:
+            return cached
 
-    order = np.argsort(np.array(zpos))
-    vol = np.stack([slices[i] for i in order], axis=0).astype(np.int16, copy=False)
+    try:
+        import pydicom  # noqa: F401  (used by read_header / read_pixels)
+    except ImportError:
+        raise RuntimeError("pydicom が見つかりません。`pip install pydicom` を実行してください。")
+
+    # two threaded passes (file I/O, parsing and C decoders overlap across threads):
+    # 1) headers only -> z / rescale / geometry; map() keeps file order, so spacing/origin
+    #    still come from the first image file
+    # 2) pixels in sorted z order, written straight into one preallocated int16 volume
+    with ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 1) * 2)) as pool:
+        headers = [h for h in pool.map(read_header, files) if h is not None]
+        if not headers:
+            raise RuntimeError("有効な DICOM スライスがありません。")
+
+        # headers: (path, slope, intercept, ipp, slice_location, instance, spacing); None = tag missing
+        ipp0, spacing = headers[0][3], headers[0][6]
+        spacing = spacing or (1.0, 1.0, 1.0)
+        origin = ipp0 or (0.0, 0.0, 0.0)
+        # z from ImagePositionPatient, else SliceLocation, else the read index
+        zpos = np.array([h[3][2] if h[3] is not None else (i if h[4] is None else h[4])
+                         for i, h in enumerate(headers)], dtype=np.float64)
+        inst = np.array([h[5] or 0 for h in headers], dtype=np.int64)
+        order = np.lexsort((inst, zpos))  # by z, then InstanceNumber for slices sharing a position
+        paths = [headers[j][0] for j in order]
+        rescales = [headers[j][1:3] for j in order]
+        del headers
+
+        vol = scratch = None
+        for i, raw in enumerate(pool.map(read_pixels, paths)):
+            if vol is None:
+                vol = np.empty((len(paths),) + raw.shape, dtype=np.int16)
+            slope, intercept = rescales[i]
+            if slope == 1.0 and intercept == 0.0:
+                # identity rescale (slope 1, intercept 0): plain copy, no arithmetic
+                vol[i] = raw
+            elif slope == 1.0 and intercept.is_integer() and raw.dtype.kind in "iu" and raw.dtype.itemsize <= 2:
+                # common CT case (slope 1, integer intercept): integer add straight into the output
+                np.add(raw, int(intercept), out=vol[i], dtype=np.int32, casting="unsafe")
+            else:
+                if scratch is None:
+                    scratch = np.empty(raw.shape, dtype=np.float32)
+                np.multiply(raw, slope, out=scratch, dtype=np.float32)
+                scratch += intercept
+                vol[i] = scratch  # truncating cast to int16, as before
+    if key is not None:
+        save_cached_volume(dcm_dir, CACHE_NAMESPACE, key, vol, spacing, origin)
     return vol, spacing, origin
 
 def numpy_to_vtk_image(vol: np.ndarray, spacing, origin=(0,0,0)):
@@ -114,19 +128,141 @@ def numpy_to_vtk_image(vol: np.ndarray, spacing, origin=(0,0,0)):
     vtk_img.SetDimensions(int(x), int(y), int(z))
     vtk_img.SetSpacing(float(spacing[2]), float(spacing[1]), float(spacing[0]))  # (X,Y,Z)
     vtk_img.SetOrigin(float(origin[0]), float(origin[1]), float(origin[2]))
-    arr = np.asfortranarray(vol.transpose(2,1,0)).ravel(order="F")
-    vtk_arr = numpy_to_vtk(arr, deep=True)
+    # VTK points run X fastest, then Y, then Z -- exactly the C order of a (Z,Y,X) array,
+    # so the volume is shared as-is instead of transposed into a second copy
+    arr = np.ascontiguousarray(vol).reshape(-1)
+    # int16 (the loader's output) is named directly; anything else falls back to dtype detection
+    vtk_type = vtkConstants.VTK_SHORT if arr.dtype == np.int16 else None
+    vtk_arr = numpy_to_vtk(arr, deep=False, array_type=vtk_type)
     vtk_arr.SetName("values")
     vtk_img.GetPointData().SetScalars(vtk_arr)
+    vtk_img._numpy_ref = arr  # the VTK array borrows this buffer; keep it alive with the image
     return vtk_img
 
 def robust_wl_ww(vol: np.ndarray):
-    p1, p99 = np.percentile(vol, [1, 99])
+    # initial WL/WW only (the sliders refine it): every 4th voxel per axis is a zero-copy view
+    # with 1/64 of the data and gives the same 1/99 percentiles to within a few HU
+    p1, p99 = histogram_percentiles(vol[::4, ::4, ::4], [1, 99])
     wl = float((p1+p99)/2.0)
     ww = float(max(p99-p1, 1.0))
     return wl, ww
 
+class Uint8Volume:
+    """
+    uint8 copy of a volume for the volume mapper, baked to twice the current window
+    (half the texture memory and fetch bandwidth of int16). Transfer-function points are
+    given in the volume's own units and converted with to_u8().
+    """
+    def __init__(self, vol: np.ndarray, ref_img):
+        self.vol = vol
+        self.buf = np.empty(vol.shape, dtype=np.uint8)
+        self._scratch = np.empty(vol.shape[1:], dtype=np.float32)
+        self.vtk_img = vtkImageData()
+        self.vtk_img.CopyStructure(ref_img)  # same dims/spacing/origin as the source image
+        vtk_arr = numpy_to_vtk(self.buf.reshape(-1), deep=False, array_type=vtkConstants.VTK_UNSIGNED_CHAR)
+        vtk_arr.SetName("values")
+        self.vtk_img.GetPointData().SetScalars(vtk_arr)
+        self.vtk_img._numpy_ref = self.buf
+        self.low = self.high = None
+
+    def ensure(self, low: float, high: float) -> bool:
+        """Rebake when [low, high] leaves the baked range or shrinks below a quarter of it."""
+        if (self.low is not None and self.low <= low and high <= self.high
+                and (high - low) * 4.0 >= self.high - self.low):
+            return False
+        width = max(high - low, 1.0)
+        self.low, self.high = low - width / 2.0, high + width / 2.0
+        scale = 255.0 / (self.high - self.low)
+        s = self._scratch
+        for z in range(self.vol.shape[0]):  # slice by slice: no volume-sized float temporary
+            np.subtract(self.vol[z], self.low, out=s, dtype=np.float32)
+            s *= scale
+            np.clip(s, 0.0, 255.0, out=s)
+            np.rint(s, out=s)
+            self.buf[z] = s
+        self.vtk_img.GetPointData().GetScalars().Modified()
+        self.vtk_img.Modified()
+        return True
+
+    def to_u8(self, v: float) -> float:
+        return (float(v) - self.low) * 255.0 / (self.high - self.low)
+
+def fill_transfer_functions(ctf, otf, rgb_points, opacity_points):
+    """Replace all TF points with one FillFromDataPointer call each ((x, r, g, b) / (x, a) rows)."""
+    c = np.asarray(rgb_points, dtype=np.float64)
+    o = np.asarray(opacity_points, dtype=np.float64)
+    ctf.FillFromDataPointer(len(c), c.ravel())
+    otf.FillFromDataPointer(len(o), o.ravel())
+
+def make_volume_mapper(vtk_img, spacing):
+    """
+    Volume mapper for the 3D views: GPU ray casting through vtkSmartVolumeMapper by default,
+    the CPU fixed-point ray caster when VIEWER_VTK_GPU=0.
+    """
+    if os.environ.get("VIEWER_VTK_GPU", "1") == "0":
+        mapper = vtkFixedPointVolumeRayCastMapper()
+    else:
+        from vtkmodules.vtkRenderingVolumeOpenGL2 import vtkSmartVolumeMapper
+        mapper = vtkSmartVolumeMapper()
+        mapper.SetRequestedRenderModeToDefault()  # GPU ray casting when usable, CPU otherwise
+        if hasattr(mapper, "SetUseJittering"):  # VTK >= 9.1: breaks up wood-grain banding at coarse sampling
+            mapper.SetUseJittering(True)
+    fine, coarse = _sample_distances(spacing)
+    mapper.SetAutoAdjustSampleDistances(True)
+    mapper.SetSampleDistance(fine)
+    if hasattr(mapper, "SetInteractiveSampleDistance"):  # fixed-point mapper's own interactive setting
+        mapper.SetInteractiveSampleDistance(coarse)
+    mapper.SetInputData(vtk_img)
+    return mapper
+
+def _sample_distances(spacing):
+    # (still, interactive) ray sample distances in mm
+    d = max(float(s) for s in spacing)
+    return d / 2.0, d * 2.0
+
+def attach_interactive_sampling(iren, win, mapper, spacing):
+    """
+    Coarse ray sampling while a mouse button is held (camera or slider drag), fine again on release.
+    Auto-adjust is off while the button is down (it would pick its own distance and ignore the swap).
+    """
+    fine, coarse = _sample_distances(spacing)
+    # auto: auto-adjust setting to restore; drawn: a frame was rendered with the coarse distance
+    state = {"held": False, "auto": True, "drawn": False}
+
+    def on_render(obj, ev):
+        if state["held"]:
+            state["drawn"] = True
+
+    def on_press(obj, ev):
+        if state["held"]:
+            return  # second button while the first is still down
+        state.update(held=True, auto=bool(mapper.GetAutoAdjustSampleDistances()), drawn=False)
+        mapper.SetAutoAdjustSampleDistances(False)
+        mapper.SetSampleDistance(coarse)
+
+    def on_release(obj, ev):
+        if not state["held"]:
+            return
+        state["held"] = False
+        mapper.SetAutoAdjustSampleDistances(state["auto"])
+        mapper.SetSampleDistance(fine)
+        # a plain click (2D pane, pick) never drew a coarse frame: nothing on screen to refine
+        if state["drawn"]:
+            win.Render()
+
+    win.AddObserver("EndEvent", on_render)
+
+    # observed on the interactor itself (the style switch, 'j'/'t' keys, swaps styles underneath),
+    # at high priority so it runs before widgets/styles that may abort the event
+    for button in ("Left", "Middle", "Right"):
+        iren.AddObserver(button + "ButtonPressEvent", on_press, 1.0)
+        iren.AddObserver(button + "ButtonReleaseEvent", on_release, 1.0)
+
 # ---------- Viewer (pure VTK window) ----------
+# plane -> VTK slice axis (X=0, Y=1, Z=2); the numpy volume is (Z, Y, X), i.e. shape[2 - axis]
+PLANE_AXES = {"Axial": 2, "Coronal": 1, "Sagittal": 0}
+PLANE_KEYS = {"a": "Axial", "c": "Coronal", "s": "Sagittal"}
+
 class PureVTKViewer:
     def __init__(self, vtk_img, vol_np, spacing):
         self.vtk_img = vtk_img
@@ -135,6 +271,7 @@ class PureVTKViewer:
         self.mode_3d = False
         self.blend_mip = False
         self.plane = "Axial"
+        self.plane_axis = PLANE_AXES["Axial"]
 
         self.wl, self.ww = robust_wl_ww(vol_np)
         self.slice_index = vol_np.shape[0] // 2
@@ -170,27 +307,22 @@ class PureVTKViewer:
         # 2D slice
         self.slice_actor = vtkImageSlice()
         self.slice_mapper = vtkImageSliceMapper()
-        self.slice_mapper.SetInputData(self.vtk_img)
         self.slice_actor.SetMapper(self.slice_mapper)
+        # one single-slice image per plane whose buffer is shared with VTK; a slice change is a
+        # plain numpy copy into it instead of the mapper re-extracting from the full volume
+        self.slice_bufs, self.slice_imgs = {}, {}
+        for axis in PLANE_AXES.values():
+            shape = list(vol_np.shape)
+            shape[2 - axis] = 1
+            self.slice_bufs[axis] = np.empty(shape, dtype=vol_np.dtype)
+            self.slice_imgs[axis] = numpy_to_vtk_image(self.slice_bufs[axis], spacing, vtk_img.GetOrigin())
         sp = self.slice_actor.GetProperty()
         sp.SetColorWindow(self.ww)
         sp.SetColorLevel(self.wl)
         self.ren.AddViewProp(self.slice_actor)
 
-        # 3D volume (CPU)
-        self.ctf = vtkColorTransferFunction()
-        self.otf = vtkPiecewiseFunction()
-        self.vol_prop = vtkVolumeProperty()
-        self.vol_prop.SetColor(self.ctf)
-        self.vol_prop.SetScalarOpacity(self.otf)
-        self.vol_prop.ShadeOff()
-        self.vol_prop.SetInterpolationTypeToLinear()
-        self.update_tf()
-        self.vol_mapper = vtkFixedPointVolumeRayCastMapper()
-        self.vol_mapper.SetInputData(self.vtk_img)
-        self.vol_actor = vtkVolume()
-        self.vol_actor.SetMapper(self.vol_mapper)
-        self.vol_actor.SetProperty(self.vol_prop)
+        # 3D volume pipeline (uint8 copy, mapper, TFs) is built on first entry to 3D, see _ensure_3d
+        self._3d_ready = False
 
         # Sliders (Slice / WL / WW)
         self.slider_slice = self.make_slider(0, self.max_index_for_plane(), self.slice_index,
@@ -198,6 +330,10 @@ class PureVTKViewer:
         self.slider_wl = self.make_slider(-2000, 3000, self.wl, 0.35, 0.15, "WL", self.on_wl_changed)
         self.slider_ww = self.make_slider(1, 6000, self.ww, 0.65, 0.15, "WW", self.on_ww_changed)
 
+        # slider drags only mark the slice / TF dirty; the repeating timer (see start) applies them once per tick
+        self._slice_dirty = False
+        self._tf_dirty = False
+        self.iren.AddObserver("TimerEvent", self.on_timer)
         self.iren.AddObserver("KeyPressEvent", self.on_key)
         self.update_plane("Axial")
         self.update_status()
@@ -231,22 +367,30 @@ class PureVTKViewer:
         return sl
 
     def max_index_for_plane(self):
-        z,y,x = self.vol_np.shape
-        return {"Axial": z-1, "Coronal": y-1}.get(self.plane, x-1)
-
-    def apply_slice(self):
-        if self.plane == "Axial":
-            self.slice_mapper.SetOrientationToZ()
-        elif self.plane == "Coronal":
-            self.slice_mapper.SetOrientationToY()
-        else:
-            self.slice_mapper.SetOrientationToX()
-        self.slice_mapper.SetSliceNumber(int(self.slice_index))
-        self.win.Render()
-        self.update_status()
+        return self.vol_np.shape[2 - self.plane_axis] - 1
+
+    def apply_slice(self, render=True):
+        axis, i = self.plane_axis, int(self.slice_index)
+        index = [slice(None)] * 3
+        index[2 - axis] = slice(i, i + 1)
+        np.copyto(self.slice_bufs[axis], self.vol_np[tuple(index)])
+        img = self.slice_imgs[axis]
+        origin = list(self.vtk_img.GetOrigin())
+        origin[axis] += i * self.vtk_img.GetSpacing()[axis]  # keep the slice at its position in the volume
+        img.SetOrigin(origin)
+        img.GetPointData().GetScalars().Modified()
+        img.Modified()
+        if render:
+            self.win.Render()
+            self.update_status()
 
     def update_plane(self, plane):
+        # orientation only changes with the plane, so set it here rather than per slice
         self.plane = plane
+        self.plane_axis = PLANE_AXES[plane]
+        self.slice_mapper.SetInputData(self.slice_imgs[self.plane_axis])
+        self.slice_mapper.SetOrientation(self.plane_axis)
+        self.slice_mapper.SetSliceNumber(0)
         rep = self.slider_slice.GetRepresentation()
         rep.SetMinimumValue(0.0)
         rep.SetMaximumValue(float(self.max_index_for_plane()))
@@ -257,35 +401,51 @@ class PureVTKViewer:
     def update_tf(self):
         low = self.wl - self.ww/2.0
         high = self.wl + self.ww/2.0
-        self.ctf.RemoveAllPoints()
-        self.ctf.AddRGBPoint(low, 0.0, 0.0, 0.0)
-        self.ctf.AddRGBPoint(high, 1.0, 1.0, 1.0)
-        self.otf.RemoveAllPoints()
-        self.otf.AddPoint(low, 0.0)
-        self.otf.AddPoint((low+high)/2.0, 0.2)
-        self.otf.AddPoint(high, 1.0)
+        if self.mode_3d:
+            # volume TF lives in the uint8 domain of vol_u8 (rebaked only when the window drifts)
+            self.vol_u8.ensure(low, high)
+            # sub-HU slider jitter is invisible in the 8-bit volume: refill only when the
+            # rounded window or the baked range changes
+            key = (round(low), round(high), self.vol_u8.low, self.vol_u8.high)
+            if key != self._tf_key:
+                self._tf_key = key
+                u = self.vol_u8.to_u8
+                fill_transfer_functions(
+                    self.ctf, self.otf,
+                    [(u(low), 0.0, 0.0, 0.0), (u(high), 1.0, 1.0, 1.0)],
+                    [(u(low), 0.0), (u((low+high)/2.0), 0.2), (u(high), 1.0)])
         sp = self.slice_actor.GetProperty()
         sp.SetColorWindow(max(self.ww, 1.0))
         sp.SetColorLevel(self.wl)
 
     def on_slice_changed(self, obj, ev):
         self.slice_index = int(round(obj.GetRepresentation().GetValue()))
-        self.apply_slice()
+        self._slice_dirty = True
 
     def on_wl_changed(self, obj, ev):
         self.wl = float(obj.GetRepresentation().GetValue())
-        self.update_tf(); self.update_status(); self.win.Render()
+        self._tf_dirty = True
 
     def on_ww_changed(self, obj, ev):
         self.ww = float(obj.GetRepresentation().GetValue())
         if self.ww < 1.0: self.ww = 1.0
-        self.update_tf(); self.update_status(); self.win.Render()
+        self._tf_dirty = True
+
+    def on_timer(self, obj, ev):
+        # coalesce slider InteractionEvents: at most one slab copy / TF update + render per timer tick
+        if not (self._slice_dirty or self._tf_dirty):
+            return
+        if self._slice_dirty:
+            self._slice_dirty = False
+            self.apply_slice(render=False)
+        if self._tf_dirty:
+            self._tf_dirty = False
+            self.update_tf()
+        self.update_status(); self.win.Render()
 
     def on_key(self, obj, ev):
         key = self.iren.GetKeySym().lower()
-        if key == "a": self.update_plane("Axial")
-        elif key == "c": self.update_plane("Coronal")
-        elif key == "s": self.update_plane("Sagittal")
+        if key in PLANE_KEYS: self.update_plane(PLANE_KEYS[key])
         elif key == "v": self.toggle_volume()
         elif key == "m":
             if self.mode_3d:
@@ -295,13 +455,36 @@ class PureVTKViewer:
                 self.win.Render()
         self.update_status()
 
+    def _ensure_3d(self):
+        if self._3d_ready:
+            return
+        self.ctf = vtkColorTransferFunction()
+        self.otf = vtkPiecewiseFunction()
+        self.vol_prop = vtkVolumeProperty()
+        self.vol_prop.SetColor(self.ctf)
+        self.vol_prop.SetScalarOpacity(self.otf)
+        self.vol_prop.ShadeOff()
+        self.vol_prop.SetInterpolationTypeToLinear()
+        # the 2D slice keeps the int16 image; the ray caster reads a uint8 copy baked on entering 3D
+        self.vol_u8 = Uint8Volume(self.vol_np, self.vtk_img)
+        self._tf_key = None  # last (low, high, baked range) pushed into ctf/otf
+        # GPU ray casting, see make_volume_mapper
+        self.vol_mapper = make_volume_mapper(self.vol_u8.vtk_img, self.spacing)
+        attach_interactive_sampling(self.iren, self.win, self.vol_mapper, self.spacing)
+        self.vol_actor = vtkVolume()
+        self.vol_actor.SetMapper(self.vol_mapper)
+        self.vol_actor.SetProperty(self.vol_prop)
+        self._3d_ready = True
+
     def toggle_volume(self):
         if not self.mode_3d:
+            self._ensure_3d()
             self.ren.RemoveViewProp(self.slice_actor)
             if self.blend_mip: self.vol_mapper.SetBlendModeToMaximumIntensity()
             else: self.vol_mapper.SetBlendModeToComposite()
             self.ren.AddViewProp(self.vol_actor)
             self.mode_3d = True
+            self.update_tf()
         else:
             self.ren.RemoveViewProp(self.vol_actor)
             self.ren.AddViewProp(self.slice_actor)
@@ -368,6 +551,7 @@ class PureVTKViewer:
     def start(self, size=(1100, 800)):
         self.win.SetSize(*size)
         self.iren.Initialize()
+        self.iren.CreateRepeatingTimer(16)  # ~60 Hz flush of slider-driven TF changes
         self.win.Render()
         print("Keys: A/C/S plane, V 2D<->3D, M MIP(3D). Sliders: Slice/WL/WW")
         self.iren.Start()
@@ -376,7 +560,6 @@ class VTK3DWindow:
     """3D専用（純VTK別ウィンドウ）。WL/WWはキーボードで簡易調整、MでMIP切替。"""
     def __init__(self, vtk_img, vol_np, spacing, wl=None, ww=None):
         from vtkmodules.vtkRenderingCore import vtkRenderer, vtkRenderWindow, vtkRenderWindowInteractor, vtkVolume, vtkVolumeProperty, vtkColorTransferFunction
-        from vtkmodules.vtkRenderingVolume import vtkFixedPointVolumeRayCastMapper
         from vtkmodules.vtkCommonDataModel import vtkPiecewiseFunction
 
         self.vtk_img = vtk_img
@@ -396,6 +579,9 @@ class VTK3DWindow:
         self.seg_low  = float(DEFAULT_LUNG_LOW_HU)
         self.seg_high = float(DEFAULT_LUNG_HIGH_HU)
         self._masked_vtk_img = None  # cached vtkImageData when seg_enabled
+        # the mapper reads uint8 copies (full / masked) baked around the current window
+        self._u8 = Uint8Volume(vol_np, vtk_img)
+        self._masked_u8 = None
 
         self.ren = vtkRenderer()
         self.ren.SetBackground(0.02, 0.02, 0.03)
@@ -424,9 +610,10 @@ class VTK3DWindow:
         self.prop.SetScalarOpacity(self.otf)
         self.prop.SetInterpolationTypeToLinear()
         self.prop.ShadeOff()
+        self._tf_key = None  # last (volume, baked range, mode, low, high) pushed into ctf/otf
 
-        self.mapper = vtkFixedPointVolumeRayCastMapper()
-        self.mapper.SetInputData(self.vtk_img)
+        self.mapper = make_volume_mapper(self._u8.vtk_img, self.spacing)
+        attach_interactive_sampling(self.iren, self.win, self.mapper, self.spacing)
         self.actor = vtkVolume()
         self.actor.SetMapper(self.mapper)
         self.actor.SetProperty(self.prop)
@@ -435,6 +622,10 @@ class VTK3DWindow:
         self.ren.AddViewProp(self.actor)
         self.ren.ResetCamera()
 
+        # slider drags only mark the TF dirty; the repeating timer (see start) applies it once per tick
+        self._tf_dirty = False
+        self._syncing = False  # set while one slider pushes values into the others
+        self.iren.AddObserver("TimerEvent", self._on_timer)
         self.iren.AddObserver("KeyPressEvent", self._on_key)
 
         # --- Sliders for WL/WW ---
@@ -448,8 +639,11 @@ class VTK3DWindow:
         self.slider_high.EnabledOff()
 
         # Sliders for HU masking (Seg Low/Seg High) — hidden until toggled
-        self.slider_seg_low  = self._make_slider(-1500, 1000, self.seg_low, 0.25, 0.05, "Seg Low",  self._on_seg_low)
-        self.slider_seg_high = self._make_slider(-1500, 1000, self.seg_high, 0.60, 0.05, "Seg High", self._on_seg_high)
+        # the masked volume is rebuilt once on release, not on every drag sample
+        self.slider_seg_low  = self._make_slider(-1500, 1000, self.seg_low, 0.25, 0.05, "Seg Low",  self._on_seg_low,
+                                                 self._on_seg_release)
+        self.slider_seg_high = self._make_slider(-1500, 1000, self.seg_high, 0.60, 0.05, "Seg High", self._on_seg_high,
+                                                 self._on_seg_release)
         self.slider_seg_low.EnabledOff()
         self.slider_seg_high.EnabledOff()
 
@@ -467,33 +661,32 @@ class VTK3DWindow:
         self.wl = (low + high) / 2.0
         self.ww = max(high - low, 1.0)
 
-        self.ctf.RemoveAllPoints()
-        self.ctf.AddRGBPoint(low, 0,0,0)
-        self.ctf.AddRGBPoint(high, 1,1,1)
+        # TF points are in the uint8 domain of whichever baked volume the mapper is reading
+        q = self._masked_u8 if (self.seg_enabled and self._masked_vtk_img is not None) else self._u8
+        q.ensure(low, high)
+        u = q.to_u8
 
-        self.otf.RemoveAllPoints()
-        if self.mode == "band":
-            # band-pass: only the band is visible, outside is 0 opacity
-            mid = (low + high) / 2.0
-            margin = max(self.ww * 0.05, 5.0)
-            self.otf.AddPoint(low - 2*margin, 0.0)
-            self.otf.AddPoint(low,            0.0)
-            self.otf.AddPoint(mid,            0.6)
-            self.otf.AddPoint(high,           0.0)
-            self.otf.AddPoint(high + 2*margin,0.0)
-        else:
-            # classic windowing
-            tail = max(self.ww * 0.10, 20.0)
-            self.otf.AddPoint(low - tail,  0.0)
-            self.otf.AddPoint(low,         0.0)
-            self.otf.AddPoint((low+high)/2.0, 0.2)
-            self.otf.AddPoint(high,        1.0)
-            self.otf.AddPoint(high + tail, 1.0)
+        # skip the refill when nothing visible changed (same volume, baked range, mode, window to 1 HU)
+        key = (q, q.low, q.high, self.mode, round(low), round(high))
+        if key != self._tf_key:
+            self._tf_key = key
+            if self.mode == "band":
+                # band-pass: only the band is visible, outside is 0 opacity
+                mid = (low + high) / 2.0
+                margin = max(self.ww * 0.05, 5.0)
+                opacity = [(u(low - 2*margin), 0.0), (u(low), 0.0), (u(mid), 0.6),
+                           (u(high), 0.0), (u(high + 2*margin), 0.0)]
+            else:
+                # classic windowing
+                tail = max(self.ww * 0.10, 20.0)
+                opacity = [(u(low - tail), 0.0), (u(low), 0.0), (u((low+high)/2.0), 0.2),
+                           (u(high), 1.0), (u(high + tail), 1.0)]
+            fill_transfer_functions(self.ctf, self.otf, [(u(low), 0, 0, 0), (u(high), 1, 1, 1)], opacity)
 
         # Update status text as well
         self._update_text()
 
-    def _make_slider(self, vmin, vmax, vinit, x_norm, y_norm, title, cb):
+    def _make_slider(self, vmin, vmax, vinit, x_norm, y_norm, title, cb, end_cb=None):
         rep = vtkSliderRepresentation2D()
         rep.SetMinimumValue(float(vmin))
         rep.SetMaximumValue(float(vmax))
@@ -514,6 +707,8 @@ class VTK3DWindow:
         slider.SetAnimationModeToAnimate()
         slider.EnabledOn()
         slider.AddObserver("InteractionEvent", cb)
+        if end_cb is not None:
+            slider.AddObserver("EndInteractionEvent", end_cb)
         return slider
 
     def _update_text(self):
@@ -541,26 +736,25 @@ class VTK3DWindow:
             mask = (vol >= low) & (vol <= high)
             # Set outside to background HU
             vol[~mask] = BACKGROUND_HU
-            self._masked_vtk_img = numpy_to_vtk_image(vol, self.spacing, origin=(0,0,0))
+            self._masked_u8 = Uint8Volume(vol, self.vtk_img)
+            self._masked_vtk_img = self._masked_u8.vtk_img
             if self.seg_enabled:
                 self.mapper.SetInputData(self._masked_vtk_img)
             else:
-                self.mapper.SetInputData(self.vtk_img)
-            # Force a small TF update to ensure refresh
+                self.mapper.SetInputData(self._u8.vtk_img)
+            # Force a small TF update to ensure refresh (also bakes the masked uint8 copy)
             self._update_tf()
         except Exception:
             # Fallback to original image if anything goes wrong
             self._masked_vtk_img = None
-            self.mapper.SetInputData(self.vtk_img)
+            self._masked_u8 = None
+            self.mapper.SetInputData(self._u8.vtk_img)
 
     def _on_seg_low(self, obj, ev):
         self.seg_low = float(obj.GetRepresentation().GetValue())
         if self.seg_low > self.seg_high:
             self.seg_low = self.seg_high - 1.0
             obj.GetRepresentation().SetValue(self.seg_low)
-        if self.seg_enabled:
-            self._rebuild_segmented_image()
-            self.win.Render()
         self._update_text()
 
     def _on_seg_high(self, obj, ev):
@@ -568,53 +762,71 @@ class VTK3DWindow:
         if self.seg_high < self.seg_low:
             self.seg_high = self.seg_low + 1.0
             obj.GetRepresentation().SetValue(self.seg_high)
+        self._update_text()
+
+    def _on_seg_release(self, obj, ev):
         if self.seg_enabled:
             self._rebuild_segmented_image()
             self.win.Render()
-        self._update_text()
 
     def _on_low_slider(self, obj, ev):
+        if self._syncing:
+            return
         self.low = float(obj.GetRepresentation().GetValue())
         # clamp to keep low < high
         if self.low >= self.high:
             self.low = self.high - 1.0
             obj.GetRepresentation().SetValue(self.low)
-        self._update_tf()
-        self.win.Render()
+        self._tf_dirty = True
 
     def _on_high_slider(self, obj, ev):
+        if self._syncing:
+            return
         self.high = float(obj.GetRepresentation().GetValue())
         if self.high <= self.low:
             self.high = self.low + 1.0
             obj.GetRepresentation().SetValue(self.high)
-        self._update_tf()
-        self.win.Render()
+        self._tf_dirty = True
+
+    def _sync_band_sliders(self):
+        # programmatic SetValue must not re-enter the slider callbacks (one update per drag sample)
+        self._syncing = True
+        try:
+            if hasattr(self, "slider_low"):
+                self.slider_low.GetRepresentation().SetValue(self.low)
+            if hasattr(self, "slider_high"):
+                self.slider_high.GetRepresentation().SetValue(self.high)
+        finally:
+            self._syncing = False
 
     def _on_wl_slider(self, obj, ev):
+        if self._syncing:
+            return
         self.wl = float(obj.GetRepresentation().GetValue())
         # sync band values
         self.low = self.wl - self.ww/2.0
         self.high = self.wl + self.ww/2.0
-        if hasattr(self, "slider_low"):
-            self.slider_low.GetRepresentation().SetValue(self.low)
-        if hasattr(self, "slider_high"):
-            self.slider_high.GetRepresentation().SetValue(self.high)
-        self._update_tf()
-        self.win.Render()
+        self._sync_band_sliders()
+        self._tf_dirty = True
 
     def _on_ww_slider(self, obj, ev):
+        if self._syncing:
+            return
         self.ww = float(obj.GetRepresentation().GetValue())
         if self.ww < 1.0:
             self.ww = 1.0
         # sync band values
         self.low = self.wl - self.ww/2.0
         self.high = self.wl + self.ww/2.0
-        if hasattr(self, "slider_low"):
-            self.slider_low.GetRepresentation().SetValue(self.low)
-        if hasattr(self, "slider_high"):
-            self.slider_high.GetRepresentation().SetValue(self.high)
-        self._update_tf()
-        self.win.Render()
+        self._sync_band_sliders()
+        self._tf_dirty = True
+
+    def _on_timer(self, obj, ev):
+        # coalesce slider InteractionEvents: at most one TF update + render per timer tick
+        if self._tf_dirty:
+            self._tf_dirty = False
+            self._update_tf()
+            self.win.Render()
 
     def _on_key(self, obj, ev):
         key = self.iren.GetKeySym().lower()
@@ -664,7 +876,7 @@ class VTK3DWindow:
                 self.slider_seg_low.EnabledOn()
                 self.slider_seg_high.EnabledOn()
             else:
-                self.mapper.SetInputData(self.vtk_img)
+                self.mapper.SetInputData(self._u8.vtk_img)
                 self.slider_seg_low.EnabledOff()
                 self.slider_seg_high.EnabledOff()
             self._update_tf()
@@ -674,6 +886,7 @@ class VTK3DWindow:
     def start(self, size=(900, 700)):
         self.win.SetSize(*size)
         self.iren.Initialize()
+        self.iren.CreateRepeatingTimer(16)  # ~60 Hz flush of slider-driven TF changes
         self.win.Render()
         print("3D window: M=MIP toggle, +/-=WW, [ / ]=WL, B=Band-pass, G=HU mask (lung) on/off")
         self.iren.Start()
@@ -701,6 +914,7 @@ def _spawn_qt(dcmdir):
 
 
 def main():
+    import argparse
     parser = argparse.ArgumentParser(description="Pure VTK DICOM viewer")
     parser.add_argument("--dir", dest="dcmdir", default=None, help="DICOM folder")
     parser.add_argument("--viewer", dest="viewer", default=None, choices=["2d3d","3d"], help="Run viewer directly (no Tk controller)")
@@ -744,10 +958,10 @@ def main():
 
     vol, spacing, origin = load_dicom_series(dcmdir)
     print("VOL:", vol.shape, "spacing:", spacing, "origin:", origin)
-    vtk_img = numpy_to_vtk_image(vol, spacing, origin)
 
     # 2) If --viewer is specified, run the viewer in this main process (no Tk controller)
     if args.viewer in ("2d3d", "3d"):
+        vtk_img = numpy_to_vtk_image(vol, spacing, origin)
         mode = "3d" if args.viewer == "3d" else "2d3d"
         run_viewer_mode(vtk_img, vol, spacing, mode)
         return
@@ -760,6 +974,8 @@ def main():
     root.title("Controller")
 
     status = tk.StringVar(value=f"Loaded: {os.path.basename(dcmdir)}  shape={vol.shape}")
+    # the controller only reports the shape; viewers are separate processes that load (from the cache) themselves
+    del vol
 
     def spawn_viewer(mode: str):
         try:
@@ -786,14 +1002,12 @@ def main():
         if not newdir:
             return
         try:
+            # validates the folder and writes the volume cache the spawned viewers read;
+            # no VTK image here (the controller never renders), and v2 is dropped on return
             v2, sp2, org2 = load_dicom_series(newdir)
         except Exception as e:
             messagebox.showerror("Load Error", str(e)); return
-        # Recreate vtk image
-        vtk2 = numpy_to_vtk_image(v2, sp2, org2)
-        # Update in-memory references
         dcmdir = newdir
-        # Persist to a small cache file to allow quick relaunch with new dir
         status.set(f"Loaded: {os.path.basename(dcmdir)}  shape={v2.shape}")
 
     # Buttons
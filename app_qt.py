@@ -8,7 +8,9 @@ PySide6 2D DICOM Viewer (triple-orthogonal)
 - 各ペインに『他2面の位置』ガイド線を表示（ガイド線も面ごとにON/OFF可）
 - 「Open 3D Viewer」ボタンで純VTK(app.py)を別プロセスで起動
 """
-import os, sys, glob, subprocess
+import os, sys, subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PySide6 import QtCore, QtGui, QtWidgets
 from shiboken6 import isValid
@@ -16,11 +18,11 @@ import argparse
 
 from pathlib import Path
 
-try:
-    import pydicom
-except Exception:
-    QtWidgets.QMessageBox.critical(None, "Error", "pydicom がありません。pip install pydicom")
-    sys.exit(1)
+from numba_compat import lazy_kernel
+# 走査・2 パス読み込み・キャッシュの関数は app.py / dicom_io.py と共有
+from series_utils import (walk_files, is_dicom, read_header, read_pixels, cache_enabled, cache_key,
+                          load_cached_volume, save_cached_volume, histogram_percentiles)
+
 
 def resource_path(rel: str) -> str:
     """PyInstaller(onefile) で同梱したファイルに安全にアクセスするためのヘルパー"""
@@ -30,68 +32,141 @@ def resource_path(rel: str) -> str:
     # 通常実行時はスクリプト隣接
     return str(Path(__file__).resolve().parent / rel)
 
+# 連続化済み 2D スライスを保持する件数（Coronal/Sagittal の面 × index の LRU）
+SLICE_CACHE_SIZE = 32
+# 先頭軸で切ると Coronal / Sagittal になる軸の並び（(Y,Z,X) / (X,Z,Y)）
+PLANE_TRANSPOSE = {"y": (1, 0, 2), "x": (2, 0, 1)}
+# 転置コピー 2 面分（元ボリュームの 2 倍）がこれを超えるなら作らず、都度の連続化（LRU）だけで表示する
+PLANE_COPY_MAX_BYTES = 2 << 30
+# 転置コピーはこの行数（転置後の先頭軸）ずつ写し、合間に取り消しを確かめる
+PLANE_COPY_CHUNK = 32
+# 表示中の面の WL/WW 適用（参照表引き）をスレッドで並べる合計画素数の下限。
+# これより小さいとスレッドへの受け渡しの方が高くつくので GUI スレッドで順に処理する
+PARALLEL_WLWW_MIN_PIXELS = 1 << 19
+
 # ---------- DICOM 読み込み ----------
+# ユーザーごとのボリュームキャッシュ（series_utils.cache_dir()）での名前空間。
+# app.py とは spacing/origin の決め方が違うので別にしている
+CACHE_NAMESPACE = "qt"
+
 def load_dicom_series(dcmdir: str):
-    files = sorted(glob.glob(os.path.join(dcmdir, "**", "*.dcm"), recursive=True))
+    # ディレクトリは 1 回だけ走査し、*.dcm が無ければ同じ一覧から拡張子なしを拾う。
+    # ソートは spacing/origin を取る「最初のファイル」と同 z の並びを決めるために残す
+    all_files = sorted(walk_files(dcmdir))
+    files = [f for f in all_files if f.endswith(".dcm")]
     if not files:
-        # 拡張子なしケース拾う
-        files = [f for f in glob.glob(os.path.join(dcmdir, "**", "*"), recursive=True) if os.path.isfile(f)]
-    items = []
-    spacing = (1.0, 1.0, 1.0)
-    origin = (0.0, 0.0, 0.0)
-    for fp in files:
-        try:
-            ds = pydicom.dcmread(fp, force=True, stop_before_pixels=False)
-        except Exception:
-            continue
-        if not hasattr(ds, "PixelData"):
-            continue
-        inst = int(getattr(ds, "InstanceNumber", 0))
-        try:
-            ipp = [float(v) for v in getattr(ds, "ImagePositionPatient")]
-            z = ipp[2]
-        except Exception:
-            z = inst
-        arr = ds.pixel_array
-        slope = float(getattr(ds, "RescaleSlope", 1.0))
-        intercept = float(getattr(ds, "RescaleIntercept", 0.0))
-        arr = (arr.astype(np.float32) * slope + intercept).astype(np.int16)
-
-        # spacing / origin は最初のスライスから
-        if spacing == (1.0,1.0,1.0):
-            try:
-                py, px = [float(x) for x in getattr(ds, "PixelSpacing")]
-                pz = float(getattr(ds, "SliceThickness", 1.0))
-                spacing = (pz, py, px)  # (Z,Y,X)
-            except Exception:
-                pass
-            try:
-                ipp = [float(v) for v in getattr(ds, "ImagePositionPatient")]
-                origin = (ipp[0], ipp[1], ipp[2])
-            except Exception:
-                pass
-
-        items.append((z, arr))
-    if not items:
-        raise RuntimeError("有効な DICOM スライスが見つかりません。")
-
-    items.sort(key=lambda x: x[0])
-    vol = np.stack([a for _, a in items], axis=0)  # (Z,Y,X)
-    return vol.astype(np.int16, copy=False), spacing, origin
+        # DICOM 以外は先頭 132 バイトの "DICM" で弾く（1 件も合わなければプリアンブル無しとみなし全件）
+        files = [f for f in all_files if is_dicom(f)] or all_files
+    del all_files
+
+    # key が None: キャッシュ無効、または走査後にファイルが消えた（今回はキャッシュなしで読む）
+    key = cache_key(files) if cache_enabled() else None
+    if key is not None:
+        cached = load_cached_volume(dcmdir, CACHE_NAMESPACE, key)
+        if cached is not None:
+            return cached
+
+    # pydicom の import は重いので、実際に読み込むときまで遅らせる（ウィンドウ表示を先に）
+    try:
+        import pydicom  # noqa: F401  （read_header / read_pixels で使う）
+    except ImportError:
+        raise RuntimeError("pydicom がありません。pip install pydicom")
+    # ファイル読み込み・解析・画素展開をスレッドで重ねる。
+    # 1) ヘッダだけ読んで z 順に並べる（map はファイル順を保つ）
+    # 2) 並べた順に画素を読み、int16 ボリュームへ直接書き込む
+    with ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 1) * 2)) as pool:
+        headers = [h for h in pool.map(read_header, files) if h is not None]
+        if not headers:
+            raise RuntimeError("有効な DICOM スライスが見つかりません。")
+        # (path, z, instance, slope, intercept, spacing or None, origin or None) に直す。
+        # z は ImagePositionPatient、無ければ InstanceNumber
+        headers = [(fp, ipp[2] if ipp is not None else (inst or 0), inst or 0, slope, intercept, sp, ipp)
+                   for fp, slope, intercept, ipp, _, inst, sp in headers]
+        spacing = (1.0, 1.0, 1.0)
+        origin = (0.0, 0.0, 0.0)
+        for _, _, _, _, _, sp, org in headers:
+            # spacing / origin は最初のスライスから（ファイル順。取れるまで次を見る）
+            if spacing != (1.0,1.0,1.0):
+                break
+            if sp is not None:
+                spacing = sp
+            if org is not None:
+                origin = org
+        # z（無ければ InstanceNumber）順、同じ z は InstanceNumber 順（lexsort は安定なので残りはファイル順）
+        z = np.array([h[1] for h in headers], dtype=np.float64)
+        inst = np.array([h[2] for h in headers], dtype=np.int64)
+        headers = [headers[j] for j in np.lexsort((inst, z))]
+
+        # int16 ボリュームは1回だけ確保し、float が要るスライスだけ使い回しの float32 作業配列を通す
+        vol = scratch = None
+        for i, arr in enumerate(pool.map(read_pixels, [h[0] for h in headers])):
+            if vol is None:
+                vol = np.empty((len(headers),) + arr.shape, dtype=np.int16)  # (Z,Y,X)
+            slope, intercept = headers[i][3], headers[i][4]
+            if slope == 1.0 and intercept == 0.0:
+                # slope=1・intercept=0 は演算なしでそのままコピー
+                vol[i] = arr
+            elif slope == 1.0 and intercept.is_integer() and arr.dtype.kind in "iu" and arr.dtype.itemsize <= 2:
+                # CT で多い slope=1・整数 intercept は整数加算で直接書き込む（float を経由しない）
+                np.add(arr, int(intercept), out=vol[i], dtype=np.int32, casting="unsafe")
+            else:
+                if scratch is None:
+                    scratch = np.empty(arr.shape, dtype=np.float32)
+                np.multiply(arr, slope, out=scratch, dtype=np.float32)
+                scratch += intercept
+                vol[i] = scratch  # int16 へは従来どおり切り捨て
+    if key is not None:
+        save_cached_volume(dcmdir, CACHE_NAMESPACE, key, vol, spacing, origin)
+    return vol, spacing, origin
 
 
 # ---------- WL/WW マッピング ----------
-def wlww_to_uint8(slice_i16: np.ndarray, wl: float, ww: float) -> np.ndarray:
+@lazy_kernel
+def _wlww_kernel(nb):
+    prange = nb.prange
+
+    @nb.njit(parallel=True, fastmath=True, cache=True)
+    def kernel(sl, low, inv_range, out):
+        # 減算・正規化・クリップ・uint8 化を1パスで行う（一時配列なし）
+        for i in prange(sl.shape[0]):
+            for j in range(sl.shape[1]):
+                v = (sl[i, j] - low) * inv_range
+                if v < 0.0:
+                    v = 0.0
+                elif v > 1.0:
+                    v = 1.0
+                out[i, j] = np.uint8(v * 255.0)
+    return kernel
+
+def wlww_to_uint8(slice_i16: np.ndarray, wl: float, ww: float, out: np.ndarray = None,
+                  scratch: np.ndarray = None) -> np.ndarray:
     # window: [wl-ww/2, wl+ww/2] を 0..255 に線形マップ
+    # out（同形状の uint8）を渡すとそこへ書き込んで返す。
+    # scratch（同形状の float32）は numba が無いときの作業配列（渡せば一時配列を確保しない）
     low = wl - ww / 2.0
     high = wl + ww / 2.0
-    sl = slice_i16.astype(np.float32)
-    sl = (sl - low) / max(high - low, 1.0)
-    sl = np.clip(sl, 0.0, 1.0)
-    return (sl * 255.0).astype(np.uint8)
+    if out is None:
+        out = np.empty(slice_i16.shape, dtype=np.uint8)
+    kernel = _wlww_kernel.get()
+    if kernel is not None:
+        kernel(slice_i16, float(low), 1.0 / max(high - low, 1.0), out)
+        return out
+    if scratch is None:
+        scratch = np.empty(slice_i16.shape, dtype=np.float32)
+    np.subtract(slice_i16, low, out=scratch, dtype=np.float32)
+    scratch /= max(high - low, 1.0)
+    np.clip(scratch, 0.0, 1.0, out=scratch)
+    np.multiply(scratch, 255.0, out=out, casting="unsafe")
+    return out
+
+def wlww_lut(wl: float, ww: float) -> np.ndarray:
+    # int16 全 65536 値ぶんの WL/WW 参照表。int16 画素を uint16 として見た値（2 の補数のまま）で引く
+    values = np.arange(1 << 16, dtype=np.uint16).view(np.int16).reshape(1, -1)
+    return wlww_to_uint8(values, wl, ww).ravel()
 
 def robust_wl_ww(vol: np.ndarray):
-    p1, p99 = np.percentile(vol, [1, 99])
+    # 初期値の推定なので各軸 4 ボクセルおき（コピーなしのビュー、1/64 の量）で十分
+    p1, p99 = histogram_percentiles(vol[::4, ::4, ::4], [1, 99])
     wl = float((p1 + p99) / 2.0)
     ww = float(max(p99 - p1, 1.0))
     return wl, ww
@@ -99,10 +174,12 @@ def robust_wl_ww(vol: np.ndarray):
 
 # ---------- 画像→QImage ----------
 def ndarray_to_qimage(gray_u8: np.ndarray) -> QtGui.QImage:
+    # コピーせず numpy のバッファをそのまま包む（QImage 側がバッファへの参照を持つ）。
+    # 反転ビューなど非連続のときだけ連続化する。呼び出し側は直後に QPixmap.fromImage で
+    # 複製するので、元の uint8 バッファは次の描画で上書きしてよい
+    gray_u8 = np.ascontiguousarray(gray_u8)
     h, w = gray_u8.shape
-    buf = gray_u8.copy().tobytes()  # 寿命管理のためコピー
-    img = QtGui.QImage(buf, w, h, w, QtGui.QImage.Format_Grayscale8)
-    return img
+    return QtGui.QImage(gray_u8.data, w, h, w, QtGui.QImage.Format_Grayscale8)
 
 # ---------- 行間ギャップ挿入 ----------
 def insert_row_gaps(gray_u8: np.ndarray, gap_px: int, gap_value: int = 0) -> np.ndarray:
@@ -131,6 +208,59 @@ class OrthoView(QtWidgets.QGraphicsView):
         self.setBackgroundBrush(QtGui.QColor(18,18,22))
 
 
+class _PlaneVolumeSignals(QtCore.QObject):
+    done = QtCore.Signal(int, object)  # (job_id, {"y": vol, "x": vol})
+
+class PlaneVolumeJob(QtCore.QRunnable):
+    """Coronal/Sagittal 用の転置コピーをワーカースレッドで作る（大きいボリュームでも GUI を止めない）"""
+    def __init__(self, job_id: int, vol: np.ndarray):
+        super().__init__()
+        self.job_id = job_id
+        self.vol = vol
+        self.cancelled = False  # GUI スレッドが立て、ワーカーはチャンクの合間に見る
+        # GUI スレッドで生成しておくので、done の受け手側には queued で届く
+        self.signals = _PlaneVolumeSignals()
+
+    def cancel(self):
+        """次のシリーズを読み込んだので作りかけのコピーを捨てて止める"""
+        self.cancelled = True
+
+    def run(self):
+        vols = {}
+        for plane, axes in PLANE_TRANSPOSE.items():
+            src = self.vol.transpose(axes)
+            dst = np.empty(src.shape, dtype=src.dtype)
+            for i in range(0, src.shape[0], PLANE_COPY_CHUNK):
+                if self.cancelled:
+                    self.vol = None  # 作りかけのコピーと元ボリュームへの参照をここで手放す
+                    return
+                dst[i:i + PLANE_COPY_CHUNK] = src[i:i + PLANE_COPY_CHUNK]
+            vols[plane] = dst
+        self.vol = None
+        self.signals.done.emit(self.job_id, vols)
+
+
+class _LoadSignals(QtCore.QObject):
+    done = QtCore.Signal(int, str, object, object, object)  # (job_id, dir, vol, spacing, origin)
+    failed = QtCore.Signal(int, str)                       # (job_id, message)
+
+class LoadJob(QtCore.QRunnable):
+    """load_dicom_series をワーカースレッドで実行する（読み込み中も GUI を止めない）"""
+    def __init__(self, job_id: int, dcmdir: str):
+        super().__init__()
+        self.job_id = job_id
+        self.dcmdir = dcmdir
+        self.signals = _LoadSignals()
+
+    def run(self):
+        try:
+            vol, sp, org = load_dicom_series(self.dcmdir)
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.done.emit(self.job_id, self.dcmdir, vol, sp, org)
+
+
 class Viewer2D(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
@@ -146,12 +276,42 @@ class Viewer2D(QtWidgets.QWidget):
         self._idx_y = 0  # Coronal (Y)
         self._idx_x = 0  # Sagittal (X)
         # WL/WW 共通
-        self._wl = 40.0
-        self._ww = 400.0
+        # スライダと同じ整数で保持（float 化は wlww_to_uint8 内の計算時のみ）
+        self._wl = 40
+        self._ww = 400
+        self._wlww_shown = None  # ラベルに表示中の (WL, WW)
         self._dcmdir = None
         # (Z-stretch removed)
         # Z 方向の行間ギャップ（ピクセル数）
         self._z_gap_px = 0
+        # (plane, idx) -> 連続化済みスライス。WL/WW 変更やスクラブの往復で再取得しない
+        self._slice_cache = OrderedDict()
+        # Coronal/Sagittal 用に軸を入れ替えて連続化したボリューム（"y": (Y,Z,X), "x": (X,Z,Y)）
+        self._plane_vols = {}
+        # 転置コピーのバックグラウンド作成。読み込みごとに id を進め、古い結果は捨てる
+        self._plane_job_id = 0
+        self._plane_job = None
+        # DICOM 読み込みのバックグラウンド実行（id は転置コピーと同じく古い結果を捨てるため）
+        self._load_job_id = 0
+        self._load_job = None
+        self._load_dlg = None
+        # 直前に描画した状態。同じ状態での update_views（連鎖したシグナル等）は描き直さない
+        self._render_key = None
+        # 面ごとに直前に描いた画像の状態。変わっていない面は画像を作り直さずガイド線だけ動かす
+        self._pane_keys = {}
+        # 面ごとの WL/WW 適用後 uint8 バッファと作業配列（形状が変わるまで使い回す）
+        self._u8_bufs = {}
+        # 複数面の参照表引きを並べるスレッド（大きいスライスのときだけ、初回に作る）
+        self._wlww_pool = None
+        # int16 用の WL/WW 参照表とその (WL, WW)
+        self._lut = None
+        self._lut_key = None
+
+        # スライダのドラッグ中は valueChanged が連続するため、描画は ~60Hz に間引く
+        self._redraw_timer = QtCore.QTimer(self)
+        self._redraw_timer.setSingleShot(True)
+        self._redraw_timer.setInterval(16)
+        self._redraw_timer.timeout.connect(self.update_views)
 
         # ===== UI =====
         # 上段：操作バー
@@ -251,10 +411,13 @@ class Viewer2D(QtWidgets.QWidget):
         lay.addLayout(grid)
         lay.addLayout(info)
 
-        # ガイド線保持
-        self._line_z = []  # Axial 画面上のガイド（Y水平 / X垂直）
-        self._line_y = []  # Coronal 画面上のガイド（Z水平 / X垂直）
-        self._line_x = []  # Sagittal 画面上のガイド（Z水平 / Y垂直）
+        # 画像とガイド線のアイテムは各シーンに 1 回だけ作り、描画では中身と位置だけ差し替える
+        self._pix_z = self.scene_z.addPixmap(QtGui.QPixmap())
+        self._pix_y = self.scene_y.addPixmap(QtGui.QPixmap())
+        self._pix_x = self.scene_x.addPixmap(QtGui.QPixmap())
+        self._line_z = self._make_guides(self.scene_z)  # Axial 画面上のガイド（Y水平 / X垂直）
+        self._line_y = self._make_guides(self.scene_y)  # Coronal 画面上のガイド（Z水平 / X垂直）
+        self._line_x = self._make_guides(self.scene_x)  # Sagittal 画面上のガイド（Z水平 / Y垂直）
 
     # ---------- ファイルオープン ----------
     def on_open(self):
@@ -270,32 +433,87 @@ class Viewer2D(QtWidgets.QWidget):
         self.load_dir(d)
 
     def load_dir(self, d):
-        try:
-            vol, sp, org = load_dicom_series(d)
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(self, "Load Error", str(e))
+        # 読み込みはワーカースレッドで行い、終わったら _on_loaded で画面を初期化する
+        self._load_job_id += 1
+        job = LoadJob(self._load_job_id, d)
+        job.signals.done.connect(self._on_loaded)
+        job.signals.failed.connect(self._on_load_failed)
+        self._load_job = job  # 完了通知まで Python 側の参照を保持
+        self.btn_open.setEnabled(False)
+        if self._load_dlg is None:
+            # 範囲 0..0 で進み具合の分からない（ビジー表示の）ダイアログ。キャンセルは無し
+            self._load_dlg = QtWidgets.QProgressDialog("Loading DICOM series…", None, 0, 0, self)
+            self._load_dlg.setCancelButton(None)
+            self._load_dlg.setWindowModality(QtCore.Qt.WindowModal)
+            self._load_dlg.setMinimumDuration(0)
+        self._load_dlg.setLabelText(f"Loading DICOM series…\n{d}")
+        self._load_dlg.show()
+        QtCore.QThreadPool.globalInstance().start(job)
+
+    def _finish_load_job(self, job_id: int) -> bool:
+        if job_id != self._load_job_id:
+            return False  # 後から別フォルダの読み込みを始めていた
+        self._load_job = None
+        self._load_dlg.hide()
+        self.btn_open.setEnabled(True)
+        return True
+
+    def _on_load_failed(self, job_id: int, msg: str):
+        if self._finish_load_job(job_id):
+            QtWidgets.QMessageBox.critical(self, "Load Error", msg)
+
+    def _on_loaded(self, job_id: int, d: str, vol, sp, org):
+        if not self._finish_load_job(job_id):
             return
         self._vol, self._spacing, self._origin, self._dcmdir = vol, sp, org, d
+        self._slice_cache.clear()
+        self._plane_vols.clear()
+        self._render_key = None
+        self._pane_keys.clear()
+        self._start_plane_job(vol)
         # デフォルトはパーセンタイルから
-        self._wl, self._ww = robust_wl_ww(vol)
+        wl, ww = robust_wl_ww(vol)
+        self._wl, self._ww = int(round(wl)), max(int(round(ww)), 1)
 
         z, y, x = vol.shape
         self._idx_z = z//2; self._idx_y = y//2; self._idx_x = x//2
 
-        # スライダ範囲セット
-        self.sld_z.setRange(0, z-1); self.sld_z.setValue(self._idx_z); self.sld_z.setEnabled(True)
-        self.sld_y.setRange(0, y-1); self.sld_y.setValue(self._idx_y); self.sld_y.setEnabled(True)
-        self.sld_x.setRange(0, x-1); self.sld_x.setValue(self._idx_x); self.sld_x.setEnabled(True)
-        self.sld_wl.setValue(int(self._wl)); self.sld_ww.setValue(int(self._ww))
-        self.sld_wl.setEnabled(True); self.sld_ww.setEnabled(True)
-        self.sld_zgap.setEnabled(True); self.sld_zgap.setValue(0)
+        # ウィジェットの更新は途中で描画させず、最後に1回だけ再描画する
+        self.setUpdatesEnabled(False)
+        try:
+            self._init_controls(z, y, x)
+        finally:
+            self.setUpdatesEnabled(True)
+        self.update_views()
+
+    def _init_controls(self, z: int, y: int, x: int):
+        """読み込んだボリュームに合わせてスライダ・チェックボックス・ラベルを初期化する。"""
+        # スライダ範囲セット（状態は上で設定済みなので valueChanged は止めておく）
+        with (QtCore.QSignalBlocker(self.sld_z), QtCore.QSignalBlocker(self.sld_y),
+              QtCore.QSignalBlocker(self.sld_x), QtCore.QSignalBlocker(self.sld_wl),
+              QtCore.QSignalBlocker(self.sld_ww), QtCore.QSignalBlocker(self.sld_zgap)):
+            self._sync_slider(self.sld_z, self._idx_z, z-1); self.sld_z.setEnabled(True)
+            self._sync_slider(self.sld_y, self._idx_y, y-1); self.sld_y.setEnabled(True)
+            self._sync_slider(self.sld_x, self._idx_x, x-1); self.sld_x.setEnabled(True)
+            self._sync_slider(self.sld_wl, self._wl); self._sync_slider(self.sld_ww, self._ww)
+            self.sld_wl.setEnabled(True); self.sld_ww.setEnabled(True)
+            self.sld_zgap.setEnabled(True); self._sync_slider(self.sld_zgap, 0)
         self._z_gap_px = 0
         self.btn_3d.setEnabled(True)
         for c in (self.chk_show_z, self.chk_show_y, self.chk_show_x, self.chk_guid_z, self.chk_guid_y, self.chk_guid_x):
             c.setEnabled(True)
         self.chk_flip_z.setEnabled(True)
 
-        self.update_views()
+        self._update_label_z(); self._update_label_y(); self._update_label_x()
+        self._update_label_wlww()
+
+    @staticmethod
+    def _sync_slider(sld: QtWidgets.QSlider, value: int, vmax: int | None = None):
+        """範囲・値が既に同じなら触らない（同じシリーズの再読み込みでクランプ計算を繰り返さない）"""
+        if vmax is not None and (sld.minimum(), sld.maximum()) != (0, vmax):
+            sld.setRange(0, vmax)
+        if sld.value() != value:
+            sld.setValue(value)
 
     # ---------- 3D 起動 ----------
     def on_open_3d(self):
@@ -361,13 +579,28 @@ class Viewer2D(QtWidgets.QWidget):
 
     # ---------- スライス操作 ----------
     def on_slice_z(self, v):
-        self._idx_z = int(v); self.update_views()
+        self._idx_z = int(v); self._update_label_z(); self._redraw_timer.start()
     def on_slice_y(self, v):
-        self._idx_y = int(v); self.update_views()
+        self._idx_y = int(v); self._update_label_y(); self._redraw_timer.start()
     def on_slice_x(self, v):
-        self._idx_x = int(v); self.update_views()
+        self._idx_x = int(v); self._update_label_x(); self._redraw_timer.start()
     def on_wl_ww(self, _=None):
-        self._wl = float(self.sld_wl.value()); self._ww = float(max(self.sld_ww.value(), 1)); self.update_views()
+        self._wl = self.sld_wl.value(); self._ww = max(self.sld_ww.value(), 1)
+        self._update_label_wlww(); self._redraw_timer.start()
+
+    # ---------- ラベル（変化した値のものだけ更新する） ----------
+    def _update_label_z(self):
+        self.lbl_z.setText(f"Z: {self._idx_z}/{self._vol.shape[0]-1}")
+    def _update_label_y(self):
+        self.lbl_y.setText(f"Y: {self._idx_y}/{self._vol.shape[1]-1}")
+    def _update_label_x(self):
+        self.lbl_x.setText(f"X: {self._idx_x}/{self._vol.shape[2]-1}")
+    def _update_label_wlww(self):
+        # ドラッグ中は同じ整数値が続くことが多いので、表示値が変わったときだけ setText
+        shown = (self._wl, self._ww)
+        if shown != self._wlww_shown:
+            self.lbl_wlww.setText(f"WL/WW {shown[0]}/{shown[1]}")
+            self._wlww_shown = shown
 
     # (on_z_stretch removed)
     def _disp_z_row(self, z_count: int, iz: int) -> int:
@@ -378,15 +611,90 @@ class Viewer2D(QtWidgets.QWidget):
     def on_z_gap_changed(self, v: int):
         # 1スライスの行と行の間に gap_px ピクセルの空行を差し込む
         self._z_gap_px = int(v)
-        self.update_views()
+        self._redraw_timer.start()
 
     # ---------- スライス取得 ----------
     def _slice_z(self):
-        return np.ascontiguousarray(self._vol[self._idx_z, :, :])  # (Y,X)
+        # (Z,Y,X) の C 順なので先頭軸のスライスはそのまま連続。コピーも LRU も通さないビュー
+        return self._vol[self._idx_z]  # (Y,X)
     def _slice_y(self):
-        return np.ascontiguousarray(self._vol[:, self._idx_y, :])  # (Z,X)
+        return self._cached_slice("y", self._idx_y)  # (Z,X)
     def _slice_x(self):
-        return np.ascontiguousarray(self._vol[:, :, self._idx_x])  # (Z,Y)
+        return self._cached_slice("x", self._idx_x)  # (Z,Y)
+
+    def _start_plane_job(self, vol: np.ndarray):
+        self._plane_job_id += 1  # 作らない場合も進めて、前のシリーズの結果を捨てる
+        if self._plane_job is not None:
+            self._plane_job.cancel()  # 前のシリーズのコピーは途中で打ち切る
+        if vol.nbytes * len(PLANE_TRANSPOSE) > PLANE_COPY_MAX_BYTES:
+            self._plane_job = None
+            return
+        job = PlaneVolumeJob(self._plane_job_id, vol)
+        job.signals.done.connect(self._on_plane_vols_ready)
+        self._plane_job = job  # 完了通知まで Python 側の参照を保持
+        QtCore.QThreadPool.globalInstance().start(job)
+
+    def _on_plane_vols_ready(self, job_id: int, vols: dict):
+        if job_id != self._plane_job_id:
+            return  # 別のシリーズを読み込んだ後に届いた古い結果
+        self._plane_vols.update(vols)
+        self._plane_job = None
+
+    def _to_uint8(self, plane: str, src: np.ndarray) -> np.ndarray:
+        # 面ごとの出力（と numba 無し時の float32 作業配列）を形状が変わるまで使い回す
+        bufs = self._u8_bufs.get(plane)
+        if bufs is None or bufs[0].shape != src.shape:
+            bufs = self._u8_bufs[plane] = [np.empty(src.shape, dtype=np.uint8), None]
+        if src.dtype == np.int16:
+            # int16 は WL/WW ごとに 1 回作る参照表を引くだけ（3 面で共有）。作業配列は使わない
+            self._ensure_lut()
+            return np.take(self._lut, src.view(np.uint16), out=bufs[0], mode="clip")
+        if bufs[1] is None and _wlww_kernel.get() is None:
+            bufs[1] = np.empty(src.shape, dtype=np.float32)  # int16 以外の初回だけ確保
+        return wlww_to_uint8(src, self._wl, self._ww, out=bufs[0], scratch=bufs[1])
+
+    def _ensure_lut(self):
+        if self._lut_key != (self._wl, self._ww):
+            self._lut = wlww_lut(self._wl, self._ww)
+            self._lut_key = (self._wl, self._ww)
+
+    def _windowed_slices(self, planes) -> dict:
+        """描き直す面ごとの WL/WW 適用後 uint8。int16 で十分大きければ面ごとにスレッドで並べる。"""
+        getters = {"z": self._slice_z, "y": self._slice_y, "x": self._slice_x}
+        srcs = {p: getters[p]() for p in planes}  # スライス取得（LRU）は GUI スレッドで
+        if (len(srcs) > 1 and (os.cpu_count() or 1) > 1
+                and all(s.dtype == np.int16 for s in srcs.values())
+                and sum(s.size for s in srcs.values()) >= PARALLEL_WLWW_MIN_PIXELS):
+            # np.take は GIL を離す。参照表は先に作り、各スレッドは面ごとの出力バッファにだけ書く
+            # （numba のカーネルは並列同時呼び出しを避けるため float 経路は対象外）
+            self._ensure_lut()
+            if self._wlww_pool is None:
+                self._wlww_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="wlww")
+            futures = {p: self._wlww_pool.submit(self._to_uint8, p, src) for p, src in srcs.items()}
+            return {p: f.result() for p, f in futures.items()}
+        return {p: self._to_uint8(p, src) for p, src in srcs.items()}
+
+    def _plane_volume(self, plane: str) -> np.ndarray:
+        """先頭軸で切ると目的の面になるボリューム。Y/X は転置コピーができるまで転置ビューを返す。"""
+        if plane == "z":
+            return self._vol
+        pv = self._plane_vols.get(plane)
+        if pv is None:
+            pv = self._vol.transpose(PLANE_TRANSPOSE[plane])
+        return pv
+
+    def _cached_slice(self, plane: str, idx: int) -> np.ndarray:
+        """面と index をキーに連続化済みスライスを返す（小さな LRU）。"""
+        key = (plane, idx)
+        sl = self._slice_cache.get(key)
+        if sl is not None:
+            self._slice_cache.move_to_end(key)
+            return sl
+        sl = np.ascontiguousarray(self._plane_volume(plane)[idx])
+        self._slice_cache[key] = sl
+        if len(self._slice_cache) > SLICE_CACHE_SIZE:
+            self._slice_cache.popitem(last=False)
+        return sl
 
     # ---------- ガイド描画ユーティリティ ----------
     def _clear_lines(self, lst, scene):
@@ -403,10 +711,37 @@ class Viewer2D(QtWidgets.QWidget):
         pen = QtGui.QPen(color, 2)
         return scene.addLine(x1,y1,x2,y2, pen)
 
+    def _make_guides(self, scene):
+        # [水平線, 垂直線]。位置は描画ごとに setLine で動かす
+        lines = [self._add_line(scene, 0, 0, 0, 0), self._add_line(scene, 0, 0, 0, 0)]
+        for ln in lines:
+            ln.setVisible(False)
+        return lines
+
+    @staticmethod
+    def _set_guides(lines, visible, hy, vx, w, h):
+        # 水平線 y=hy、垂直線 x=vx（画像サイズ w×h）
+        lines[0].setLine(0, hy, w, hy)
+        lines[1].setLine(vx, 0, vx, h)
+        for ln in lines:
+            ln.setVisible(visible)
+
     # ---------- 描画更新 ----------
+    def _current_render_key(self):
+        # 描画結果を左右する状態すべて（ボリュームは load_dir で key をリセット）
+        return (self._idx_z, self._idx_y, self._idx_x, self._wl, self._ww, self._z_gap_px,
+                self.chk_show_z.isChecked(), self.chk_show_y.isChecked(), self.chk_show_x.isChecked(),
+                self.chk_guid_z.isChecked(), self.chk_guid_y.isChecked(), self.chk_guid_x.isChecked(),
+                self.chk_flip_z.isChecked())
+
     def update_views(self):
+        self._redraw_timer.stop()
         if self._vol is None:
             return
+        key = self._current_render_key()
+        if key == self._render_key:
+            return
+        self._render_key = key
         z, y, x = self._vol.shape
 
         # 物理スケール (mm/px) を取得（spacing は (pz, py, px)）
@@ -421,75 +756,88 @@ class Viewer2D(QtWidgets.QWidget):
         self.view_y.setVisible(self.chk_show_y.isChecked())
         self.view_x.setVisible(self.chk_show_x.isChecked())
 
+        # 面ごとの画像を左右する状態。表示面の組み合わせが変わるとレイアウトも変わるので fit し直す
+        shown = (self.chk_show_z.isChecked(), self.chk_show_y.isChecked(), self.chk_show_x.isChecked())
+        flip = self.chk_flip_z.isChecked()
+        pane_keys = {"z": (self._idx_z, self._wl, self._ww, shown),
+                     "y": (self._idx_y, self._wl, self._ww, self._z_gap_px, flip, shown),
+                     "x": (self._idx_x, self._wl, self._ww, self._z_gap_px, flip, shown)}
+        # Z スライダーだけ動いたなら Axial だけ描き直し、Y/X はガイド線の移動で済ませる
+        dirty = [p for p, on in zip("zyx", shown) if on and self._pane_keys.get(p) != pane_keys[p]]
+        self._pane_keys.update((p, pane_keys[p]) for p in dirty)
+        u8 = self._windowed_slices(dirty)
+
         # Z (Axial)
-        self.scene_z.clear(); self._line_z.clear()
-        if self.chk_show_z.isChecked():
-            sl = wlww_to_uint8(self._slice_z(), self._wl, self._ww)
-            h, w = sl.shape
+        if "z" in dirty:
+            sl = u8["z"]
             pix = QtGui.QPixmap.fromImage(ndarray_to_qimage(sl))
-            self.scene_z.addPixmap(pix)
+            self._pix_z.setPixmap(pix)
             self.scene_z.setSceneRect(pix.rect())
             # Axial は縦=py, 横=px。通常 px==py だが念のため補正
             scaleY_ax = (px / py)
             self.view_z.setTransform(QtGui.QTransform().scale(1.0, scaleY_ax))
-            self.view_z.fitInView(self.scene_z.itemsBoundingRect(), QtCore.Qt.KeepAspectRatio)
+            self.view_z.fitInView(self._pix_z.boundingRect(), QtCore.Qt.KeepAspectRatio)
             self.view_z.setTransformationAnchor(QtWidgets.QGraphicsView.AnchorViewCenter)
-            if self.chk_guid_z.isChecked():
-                # Y 定数 -> 水平線、X 定数 -> 垂直線
-                self._line_z.append(self._add_line(self.scene_z, 0, self._idx_y, w, self._idx_y))
-                self._line_z.append(self._add_line(self.scene_z, self._idx_x, 0, self._idx_x, h))
+        if shown[0]:
+            # Y 定数 -> 水平線、X 定数 -> 垂直線
+            r = self.scene_z.sceneRect()
+            self._set_guides(self._line_z, self.chk_guid_z.isChecked(), self._idx_y, self._idx_x,
+                             r.width(), r.height())
 
         # Y (Coronal) 画像は (Z, X)
-        self.scene_y.clear(); self._line_y.clear()
-        if self.chk_show_y.isChecked():
-            sl = wlww_to_uint8(self._slice_y(), self._wl, self._ww)
-            if self.chk_flip_z.isChecked():
+        if "y" in dirty:
+            sl = u8["y"]
+            if flip:
                 sl = np.flipud(sl)
             # Insert horizontal gaps between Z-rows
             sl = insert_row_gaps(sl, self._z_gap_px, gap_value=0)
-            h_y, w_y = sl.shape
             pix = QtGui.QPixmap.fromImage(ndarray_to_qimage(sl))
-            self.scene_y.addPixmap(pix)
+            self._pix_y.setPixmap(pix)
             self.scene_y.setSceneRect(pix.rect())
             # Coronal は画像 (Z, X)。縦=Z(pz), 横=X(px) → 縦倍率 = px/pz
             scaleY_y = (px / pz)
             self.view_y.setTransform(QtGui.QTransform().scale(1.0, scaleY_y))
-            self.view_y.fitInView(self.scene_y.itemsBoundingRect(), QtCore.Qt.KeepAspectRatio)
+            self.view_y.fitInView(self._pix_y.boundingRect(), QtCore.Qt.KeepAspectRatio)
             self.view_y.setTransformationAnchor(QtWidgets.QGraphicsView.AnchorViewCenter)
-            if self.chk_guid_y.isChecked():
-                # Z 定数 -> 水平線（row=z）、X 定数 -> 垂直線（col=x）
-                adj_z = self._disp_z_row(z, self._idx_z)
-                self._line_y.append(self._add_line(self.scene_y, 0, adj_z, w_y, adj_z))
-                self._line_y.append(self._add_line(self.scene_y, self._idx_x, 0, self._idx_x, h_y))
+        if shown[1]:
+            # Z 定数 -> 水平線（row=z）、X 定数 -> 垂直線（col=x）
+            adj_z = self._disp_z_row(z, self._idx_z)
+            r = self.scene_y.sceneRect()
+            self._set_guides(self._line_y, self.chk_guid_y.isChecked(), adj_z, self._idx_x,
+                             r.width(), r.height())
 
         # X (Sagittal) 画像は (Z, Y)
-        self.scene_x.clear(); self._line_x.clear()
-        if self.chk_show_x.isChecked():
-            sl = wlww_to_uint8(self._slice_x(), self._wl, self._ww)
-            if self.chk_flip_z.isChecked():
+        if "x" in dirty:
+            sl = u8["x"]
+            if flip:
                 sl = np.flipud(sl)
             # Insert horizontal gaps between Z-rows
             sl = insert_row_gaps(sl, self._z_gap_px, gap_value=0)
-            h_x, w_x = sl.shape
             pix = QtGui.QPixmap.fromImage(ndarray_to_qimage(sl))
-            self.scene_x.addPixmap(pix)
+            self._pix_x.setPixmap(pix)
             self.scene_x.setSceneRect(pix.rect())
             # Sagittal は画像 (Z, Y)。縦=Z(pz), 横=Y(py) → 縦倍率 = py/pz
             scaleY_x = (py / pz)
             self.view_x.setTransform(QtGui.QTransform().scale(1.0, scaleY_x))
-            self.view_x.fitInView(self.scene_x.itemsBoundingRect(), QtCore.Qt.KeepAspectRatio)
+            self.view_x.fitInView(self._pix_x.boundingRect(), QtCore.Qt.KeepAspectRatio)
             self.view_x.setTransformationAnchor(QtWidgets.QGraphicsView.AnchorViewCenter)
-            if self.chk_guid_x.isChecked():
-                # Z 定数 -> 水平線（row=z）、Y 定数 -> 垂直線（col=y）
-                adj_z = self._disp_z_row(z, self._idx_z)
-                self._line_x.append(self._add_line(self.scene_x, 0, adj_z, w_x, adj_z))
-                self._line_x.append(self._add_line(self.scene_x, self._idx_y, 0, self._idx_y, h_x))
+        if shown[2]:
+            # Z 定数 -> 水平線（row=z）、Y 定数 -> 垂直線（col=y）
+            adj_z = self._disp_z_row(z, self._idx_z)
+            r = self.scene_x.sceneRect()
+            self._set_guides(self._line_x, self.chk_guid_x.isChecked(), adj_z, self._idx_y,
+                             r.width(), r.height())
+
+    def closeEvent(self, e: QtGui.QCloseEvent):
+        # 作りかけの転置コピーは打ち切り、WL/WW 用のワーカースレッドもウィンドウと一緒に終わらせる
+        if self._plane_job is not None:
+            self._plane_job.cancel()
+            self._plane_job = None
+        if self._wlww_pool is not None:
+            self._wlww_pool.shutdown(wait=False)
+            self._wlww_pool = None
+        super().closeEvent(e)
 
-        # ラベル
-        self.lbl_z.setText(f"Z: {self._idx_z}/{z-1}")
-        self.lbl_y.setText(f"Y: {self._idx_y}/{y-1}")
-        self.lbl_x.setText(f"X: {self._idx_x}/{x-1}")
-        self.lbl_wlww.setText(f"WL/WW {int(self._wl)}/{int(self._ww)}")
 
 
 def main():
@@ -498,9 +846,9 @@ def main():
     args, unknown = parser.parse_known_args()
     app = QtWidgets.QApplication(sys.argv)
     w = Viewer2D()
+    w.show()
     if args.dcmdir:
         w.load_dir(args.dcmdir)
-    w.show()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
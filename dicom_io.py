@@ -1,17 +1,77 @@
 # dicom_io.py （丸ごと置き換え推奨）
 from __future__ import annotations
 import os
+import tempfile
 from typing import List, Tuple, Optional, Dict, Any
 import numpy as np
 import pydicom
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from series_utils import is_dicom
 
 class SeriesData:
     """1シリーズ分のデータ（時系列対応）"""
     def __init__(self, volume: np.ndarray, meta: Dict[str, Any]):
-        # volume: t=0 の [Z, Y, X] （後方互換のため）
+        # volume: t=0 の [Z, Y, X] （後方互換のため。Rescale が整数なら int16、それ以外は float32）
         self.volume = volume
         self.meta = meta  # spacing, ds0, photometric, window_center/width, volumes(各t), times(表示用) など
+        # 時相ごとの体積。描画のたびに meta を引かなくて済むよう属性として持つ
+        self.volumes: List[np.ndarray] = meta.get("volumes") or [volume]
+
+def _prefer_pylibjpeg() -> bool:
+    """
+    pylibjpeg があれば圧縮画素の展開で最優先にする（既定の順だと GDCM や Pillow が先に選ばれる）。
+    pydicom 2.x は handler の並びを入れ替え、3.x は _read_slice で転送構文ごとに plugin を指定する。
+    """
+    try:
+        import pylibjpeg  # noqa: F401
+    except ImportError:
+        return False
+    try:
+        from pydicom.pixels import get_decoder  # noqa: F401  (pydicom >= 3)
+        return True
+    except ImportError:
+        pass
+    from pydicom import config
+    from pydicom.pixel_data_handlers import pylibjpeg_handler
+    config.pixel_data_handlers = [pylibjpeg_handler] + [
+        h for h in config.pixel_data_handlers if h is not pylibjpeg_handler]
+    return True
+
+PREFER_PYLIBJPEG = _prefer_pylibjpeg()
+
+@lru_cache(maxsize=None)
+def _decoding_plugin(transfer_syntax: str) -> str:
+    # pydicom 3 で pylibjpeg がこの転送構文を展開できるなら "pylibjpeg"、それ以外は既定の選択（""）
+    try:
+        from pydicom.pixels import get_decoder
+        dec = get_decoder(transfer_syntax)
+    except (ImportError, NotImplementedError):
+        return ""
+    return "pylibjpeg" if "pylibjpeg" in dec.available_plugins else ""
+
+# これを超える 4D バッファは一時ファイル上の memmap にする（常駐メモリを OS のページキャッシュに任せる）
+MMAP_THRESHOLD_BYTES = 1 << 30
+
+def _alloc_volume4d(shape, dtype) -> np.ndarray:
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if nbytes < MMAP_THRESHOLD_BYTES:
+        return np.empty(shape, dtype=dtype)
+    # 名前なし一時ファイル。閉じてもマップは有効で、最後の参照が消えた時点で削除される
+    with tempfile.TemporaryFile(prefix="viewer_vol4d_") as f:
+        return np.memmap(f, dtype=dtype, mode="w+", shape=shape)
+
+def _rescale_dtype(raw: np.ndarray, slope: float, inter: float):
+    """
+    Rescale 後の格納型。slope/intercept が整数で、途中値も結果も int16 に収まるなら int16
+    （float32 の半分の帯域で済む）。それ以外は float32。
+    """
+    if not (float(slope).is_integer() and float(inter).is_integer()) or raw.size == 0:
+        return np.float32
+    info = np.iinfo(np.int16)
+    ends = [int(raw.min()) * int(slope), int(raw.max()) * int(slope)]
+    ends += [e + int(inter) for e in ends]
+    return np.int16 if info.min <= min(ends) and max(ends) <= info.max else np.float32
 
 def _safe_get(ds, name, default=None):
     return getattr(ds, name, default)
@@ -55,6 +115,53 @@ def _get_time_key(ds) -> Tuple[str, float, str]:
     # 未設定 → t=0 扱い
     return ("None", 0.0, "t=0")
 
+def _io_workers() -> int:
+    # dcmread のファイル I/O と圧縮展開は GIL を離すので、コア数の 2 倍まで並べる
+    return min(16, (os.cpu_count() or 1) * 2)
+
+# 1 パス目で解析するタグ。ここで読んだ ds をそのまま 2 パス目の画素展開と各時相のメタ情報に使うので、
+# 下で参照するタグと画素展開に要る Image Pixel モジュールのタグを含める（PixelData は位置だけ）
+SCAN_TAGS = [
+    "SeriesInstanceUID", "TemporalPositionIdentifier", "FrameReferenceTime", "AcquisitionTime",
+    "InstanceNumber", "ImagePositionPatient", "ImageOrientationPatient", "PixelSpacing",
+    "SliceThickness", "RescaleSlope", "RescaleIntercept", "WindowCenter", "WindowWidth",
+    "SamplesPerPixel", "PhotometricInterpretation", "PlanarConfiguration", "Rows", "Columns",
+    "BitsAllocated", "BitsStored", "HighBit", "PixelRepresentation", "NumberOfFrames",
+    "ExtendedOffsetTable", "ExtendedOffsetTableLengths", "PixelData",
+]
+
+def _scan_file(path: str):
+    """
+    1 パス目: (SeriesUID, time_tag, t_sort, t_pretty, z, inst, ds)。画像でなければ None。
+    PixelData は位置だけ覚えて読まない（2 パス目で ds.pixel_array を引いたときに読む）。
+    """
+    try:
+        # private タグや大きなシーケンスは解析しない
+        ds = pydicom.dcmread(path, force=True, defer_size="1 KB", specific_tags=SCAN_TAGS)
+        if "PixelData" not in ds:
+            return None
+        series_uid = _safe_get(ds, "SeriesInstanceUID", None)
+        if not series_uid:
+            return None
+
+        tag_name, t_sort, t_pretty = _get_time_key(ds)
+        inst = int(_safe_get(ds, "InstanceNumber", 0) or 0)
+
+        ipp = _safe_get(ds, "ImagePositionPatient", [0, 0, 0])
+        z = float(ipp[2]) if isinstance(ipp, (list, tuple)) and len(ipp) == 3 else float(inst)
+
+        return (series_uid, tag_name, t_sort, t_pretty, z, inst, ds)
+    except Exception:
+        return None
+
+def _read_slice(ds) -> np.ndarray:
+    """2 パス目: 1 パス目の ds から画素（格納型のまま）。圧縮は pylibjpeg/gdcm があれば自動展開（無ければ NotImplementedError）"""
+    if PREFER_PYLIBJPEG and hasattr(ds, "pixel_array_options"):
+        tsyntax = getattr(getattr(ds, "file_meta", None), "TransferSyntaxUID", None)
+        if tsyntax and _decoding_plugin(str(tsyntax)):
+            ds.pixel_array_options(decoding_plugin="pylibjpeg")
+    return np.asarray(ds.pixel_array)
+
 def load_series_from_folder(folder: str) -> Tuple[Optional[SeriesData], Optional[str]]:
     """
     フォルダ内のDICOMを1シリーズだけ読み込み、時系列ごとの3D体積を作成。
@@ -62,29 +169,18 @@ def load_series_from_folder(folder: str) -> Tuple[Optional[SeriesData], Optional
     """
     if not os.path.isdir(folder):
         return None, "指定フォルダが存在しません。"
+    # スキャン（1 パス目）と全時相の画素展開（2 パス目）で 1 つのスレッドプールを使い回す
+    with ThreadPoolExecutor(max_workers=_io_workers()) as pool:
+        return _load_series(folder, pool)
 
-    # 全DICOM読み込み（SeriesUID, time_key, positionZ, inst, path, ds）
-    recs = []
-    for root, _, files in os.walk(folder):
-        for f in files:
-            path = os.path.join(root, f)
-            try:
-                ds = pydicom.dcmread(path, stop_before_pixels=False, force=True)
-                if "PixelData" not in ds:
-                    continue
-                series_uid = _safe_get(ds, "SeriesInstanceUID", None)
-                if not series_uid:
-                    continue
-
-                tag_name, t_sort, t_pretty = _get_time_key(ds)
-                inst = int(_safe_get(ds, "InstanceNumber", 0) or 0)
-
-                ipp = _safe_get(ds, "ImagePositionPatient", [0, 0, 0])
-                z = float(ipp[2]) if isinstance(ipp, (list, tuple)) and len(ipp) == 3 else float(inst)
-
-                recs.append((series_uid, tag_name, t_sort, t_pretty, z, inst, path))
-            except Exception:
-                continue
+def _load_series(folder: str, pool: ThreadPoolExecutor) -> Tuple[Optional[SeriesData], Optional[str]]:
+    """load_series_from_folder の本体。ファイルの解析・画素展開は pool で並べる"""
+    # 全DICOM読み込み（SeriesUID, time_key, positionZ, inst, path）。I/O と解析をスレッドで重ねる
+    paths = [os.path.join(root, f) for root, _, files in os.walk(folder) for f in files]
+    # README や画像以外は dcmread(force=True) に渡す前に "DICM" で弾く
+    # （1 件も合わなければプリアンブル無しのファイルとみなして全件を解析する）
+    paths = [p for p in paths if is_dicom(p)] or paths
+    recs = [r for r in pool.map(_scan_file, paths) if r is not None]
 
     if not recs:
         return None, "DICOM画像が見つかりませんでした。"
@@ -93,57 +189,79 @@ def load_series_from_folder(folder: str) -> Tuple[Optional[SeriesData], Optional
     first_series = recs[0][0]
     recs = [r for r in recs if r[0] == first_series]
 
-    # 時間キーでグルーピング
-    # map: t_sort -> List[(z, inst, path, preview_pretty)]
-    timeslices = defaultdict(list)
-    time_pretty_map: Dict[float, str] = {}
-    time_tag_name = None
-    for (_, tag_name, t_sort, t_pretty, z, inst, path) in recs:
-        time_tag_name = time_tag_name or tag_name
-        timeslices[t_sort].append((z, inst, path))
-        time_pretty_map[t_sort] = t_pretty
+    # 時間キーでグルーピング：(t, z, Instance) を 1 回の lexsort で並べ、t の変わり目で時相に切る。
+    # Z位置→Instance の順（簡易。厳密には IOP から法線計算推奨）。lexsort は安定なので同値はスキャン順
+    time_tag_name = recs[0][1]
+    t_arr = np.array([r[2] for r in recs], dtype=np.float64)
+    order = np.lexsort((np.array([r[5] for r in recs], dtype=np.int64),
+                        np.array([r[4] for r in recs], dtype=np.float64), t_arr))
+    groups = np.split(order, np.flatnonzero(np.diff(t_arr[order])) + 1)
+    # 時間順の t_sort と、時相ごとの [(z, inst, ds)]（z 順）。表示ラベルはスキャン順で最後のスライスのもの
+    t_sorts = [float(t_arr[g[0]]) for g in groups]
+    time_labels = [recs[int(g.max())][3] for g in groups]
+    timeslices = [[(recs[j][4], recs[j][5], recs[j][6]) for j in g] for g in groups]
 
-    # 時間順に並べる
-    t_sorts = sorted(timeslices.keys())
+    del recs, groups  # 以降は timeslices だけが ds を持つ
 
     volumes: List[np.ndarray] = []
+    # 全時相のスライス枚数が揃っていれば (T, Z, Y, X) の連続バッファ1つに書き込む
+    # （volumes[t] はそのビュー。時相をまたぐアクセスがメモリ上で近くなる）
+    uniform_t = len({len(sl) for sl in timeslices}) == 1
+    vol4d: Optional[np.ndarray] = None
     first_ds0 = None
     spacing = None
     photometric = "MONOCHROME2"
     wc = None
     ww = None
 
-    for i, tkey in enumerate(t_sorts):
-        slices = timeslices[tkey]
-        # Z位置→Instanceの順で安定ソート（簡易。厳密には IOP から法線計算推奨）
-        slices.sort(key=lambda x: (x[0], x[1]))
-
-        pixel_arrays = []
-        ds0 = None
-        zs = []
-        for z, inst, path in slices:
-            ds = pydicom.dcmread(path, stop_before_pixels=False, force=True)
-            if ds0 is None:
-                ds0 = ds
-            try:
-                arr = ds.pixel_array  # 圧縮は pylibjpeg/gdcm があれば自動展開
-            except NotImplementedError as e:
-                hint = (
-                    "圧縮DICOMを展開できません。次をインストールしてください：\n"
-                    "  pip install pylibjpeg pylibjpeg-libjpeg pylibjpeg-openjpeg\n"
-                    "  （または pip install gdcm）\n"
-                    f"詳細: {e}"
-                )
-                return None, hint
-            pixel_arrays.append(np.asarray(arr).astype(np.int16))
-            zs.append(z)
-
-        vol = np.stack(pixel_arrays, axis=0).astype(np.float32)  # [Z, Y, X]
-
-        # HU変換
+    for i, slices in enumerate(timeslices):
+        # 画素の読み込み・展開もスレッドで並べる（map は z 順を保つ）。ファイルの解析は 1 パス目の 1 回のみ。
+        # スライスのリストと np.stack は作らず、最初のスライスの形で確保した [Z, Y, X] に順に書き込む（int16 化もここで）
+        zs = [z for z, _, _ in slices]
+        raw = None
+        try:
+            for j, arr in enumerate(pool.map(_read_slice, [ds for _, _, ds in slices])):
+                if raw is None:
+                    raw = np.empty((len(slices),) + arr.shape, dtype=np.int16)
+                raw[j] = arr
+        except NotImplementedError as e:
+            hint = (
+                "圧縮DICOMを展開できません。次をインストールしてください：\n"
+                "  pip install pylibjpeg pylibjpeg-libjpeg pylibjpeg-openjpeg\n"
+                "  （または pip install gdcm）\n"
+                f"詳細: {e}"
+            )
+            return None, hint
+        ds0 = slices[0][2]
+        slices.clear()  # 展開済みの ds（PixelData と画素キャッシュ）を手放す。ds0 だけメタ情報用に残る
+
         slope = float(_safe_get(ds0, "RescaleSlope", 1.0))
         inter = float(_safe_get(ds0, "RescaleIntercept", 0.0))
-        vol = vol * slope + inter
+        dtype = _rescale_dtype(raw, slope, inter)
+        if i == 0:
+            out_dtype = dtype  # 全時相の格納型（途中で float が必要になったら揃えて切り替える）
+            if uniform_t:
+                vol4d = _alloc_volume4d((len(t_sorts),) + raw.shape, out_dtype)
+        elif dtype == np.float32 and out_dtype == np.int16:
+            out_dtype = np.float32
+            volumes = [v.astype(np.float32) for v in volumes]
+            vol4d = None
+        if vol4d is not None and raw.shape == vol4d.shape[1:]:
+            vol = vol4d[i]
+        else:
+            vol4d = None  # 形状が揃わない → 時相ごとの配列にフォールバック
+            vol = np.empty(raw.shape, dtype=out_dtype)
+
+        # HU変換（出力先へ直接書き込む。int16 格納時も計算は int32 で行う）
+        # slope=1 は乗算を省いて 1 パス（CT で多い）。slope=1・intercept=0 はコピーのみ
+        calc = np.int32 if vol.dtype == np.int16 else np.float32
+        if slope == 1.0 and inter == 0.0:
+            vol[...] = raw
+        elif slope == 1.0:
+            np.add(raw, inter if calc is np.float32 else int(inter), out=vol, dtype=calc, casting="unsafe")
+        else:
+            np.multiply(raw, slope if calc is np.float32 else int(slope), out=vol, dtype=calc, casting="unsafe")
+            np.add(vol, inter if calc is np.float32 else int(inter), out=vol, dtype=calc, casting="unsafe")
 
         # 初回でメタ設定
         if i == 0:
@@ -173,8 +291,11 @@ def load_series_from_folder(folder: str) -> Tuple[Optional[SeriesData], Optional
 
         volumes.append(vol)
 
-    # 表示用の time ラベル
-    time_labels = [time_pretty_map[t] for t in t_sorts]
+    # 呼び出し側へ渡す ds0 は全タグ入りで読み直す（1 ファイルだけ。PixelData は読まない）
+    try:
+        ds0 = pydicom.dcmread(ds0.filename, force=True, defer_size="1 KB")
+    except Exception:
+        pass  # 読めなければ 1 パス目のタグだけの ds0 のまま
 
     # 方向行列と原点（LPS座標）
     iop = _safe_get(ds0, "ImageOrientationPatient", [1,0,0, 0,1,0])  # [rx,ry,rz, cx,cy,cz]
@@ -219,5 +340,6 @@ def load_series_from_folder(folder: str) -> Tuple[Optional[SeriesData], Optional
         "time_keys": t_sorts if 't_sorts' in locals() else [0.0],
         "time_labels": time_labels if 'time_labels' in locals() else ["t=0"],
         "volumes": volumes if 'volumes' in locals() else [vol],
+        "volumes4d": vol4d,                             # (T,Z,Y,X) 連続配列（形状不揃いなら None）
     }
     return SeriesData(volumes[0] if 'volumes' in locals() else vol.astype(np.float32), meta), None
\ No newline at end of file
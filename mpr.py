@@ -1,8 +1,26 @@
 # mpr.py
 from __future__ import annotations
+from collections import OrderedDict
+import weakref
 import numpy as np
 import SimpleITK as sitk
 
+try:
+    from scipy.ndimage import map_coordinates  # 任意。無ければ SimpleITK の Resample で同じ面を切る
+except ImportError:
+    map_coordinates = None
+
+# reslice_oblique で使い回す sitk.Image の件数（ボリューム・幾何ごとの LRU）
+SRC_CACHE_SIZE = 2
+_src_cache: OrderedDict = OrderedDict()
+
+def clear_source_cache():
+    """使い回し中の sitk.Image をすべて捨てる（シリーズを切り替えたときに呼ぶ）"""
+    _src_cache.clear()
+
+def _drop_source(key):
+    _src_cache.pop(key, None)
+
 def _normalize(v):
     v = np.asarray(v, dtype=float)
     n = np.linalg.norm(v)
@@ -29,7 +47,8 @@ def build_sitk_image(volume_zyx: np.ndarray, spacing_zyx, origin_xyz, direction_
     origin_xyz:  (X,Y,Z)
     direction_9: フラットな9要素（行優先 or 列優先でも一致させればOK）
     """
-    img = sitk.GetImageFromArray(volume_zyx.astype(np.float32))  # [Z,Y,X]
+    # GetImageFromArray 自体がコピーするので、float32 のときは astype でさらに複製しない
+    img = sitk.GetImageFromArray(volume_zyx.astype(np.float32, copy=False))  # [Z,Y,X]
     # SimpleITK は spacing=(X,Y,Z)
     px = float(spacing_zyx[2]); py = float(spacing_zyx[1]); pz = float(spacing_zyx[0])
     img.SetSpacing((px, py, pz))
@@ -37,6 +56,98 @@ def build_sitk_image(volume_zyx: np.ndarray, spacing_zyx, origin_xyz, direction_
     img.SetDirection(tuple([float(v) for v in direction_9]))  # 3x3 flatten
     return img
 
+def _cached_sitk_image(volume_zyx: np.ndarray, spacing_zyx, origin_xyz, direction_9):
+    """
+    同じボリューム・幾何なら前回の sitk.Image を返す（面を動かすたびに全体をコピーしない）。
+    ボリュームの同一性は配列オブジェクトで見るので、中身を書き換えた場合は別の配列で渡すこと。
+    """
+    key = (id(volume_zyx), volume_zyx.shape, volume_zyx.dtype.str,
+           tuple(float(v) for v in spacing_zyx), tuple(float(v) for v in origin_xyz),
+           tuple(float(v) for v in direction_9))
+    hit = _src_cache.get(key)
+    # 配列は弱参照で持つ（キャッシュがボリュームを生かし続けない）。配列が解放されたら
+    # finalize でエントリも消えるので、同じ id が別の配列に使われて誤ヒットすることはない
+    if hit is not None and hit[0]() is volume_zyx:
+        _src_cache.move_to_end(key)
+        return hit[1]
+    img = build_sitk_image(volume_zyx, spacing_zyx, origin_xyz, direction_9)
+    _src_cache[key] = (weakref.ref(volume_zyx), img)
+    weakref.finalize(volume_zyx, _drop_source, key)
+    if len(_src_cache) > SRC_CACHE_SIZE:
+        _src_cache.popitem(last=False)
+    return img
+
+def _plane_indices(volume_shape, spacing_zyx, origin_xyz, direction_9, origin_out, e0, e1, nx, ny, sx, sy):
+    """
+    出力画素 (j, i) の位置 origin_out + i*sx*e0 + j*sy*e1 を、元ボリュームの連続 index へ。
+    戻り値は map_coordinates にそのまま渡せる [z, y, x] 順の (3, ny, nx)。
+    """
+    # 物理座標 = origin + D @ (index_xyz * spacing_xyz) の逆変換（D は sitk と同じ行優先の方向行列）
+    Dinv = np.linalg.inv(np.asarray(direction_9, dtype=float).reshape(3, 3))
+    sp_xyz = np.array([spacing_zyx[2], spacing_zyx[1], spacing_zyx[0]], dtype=float)
+    base = Dinv @ (np.asarray(origin_out, dtype=float) - np.asarray(origin_xyz, dtype=float)) / sp_xyz
+    di = Dinv @ (sx * np.asarray(e0, dtype=float)) / sp_xyz  # 出力 X に 1 画素進んだときの index 増分
+    dj = Dinv @ (sy * np.asarray(e1, dtype=float)) / sp_xyz  # 出力 Y に 1 画素
+    ii = np.arange(nx, dtype=np.float64)
+    jj = np.arange(ny, dtype=np.float64)
+    idx = np.empty((3, ny, nx), dtype=np.float64)
+    for a, c in enumerate((2, 1, 0)):  # [z, y, x] ← xyz の成分
+        idx[a] = base[c] + dj[c] * jj[:, None] + di[c] * ii[None, :]
+    return idx
+
+def _reslice_aligned(volume_zyx, idx, default_val, fast):
+    """
+    出力格子がボクセル格子に乗っているとき（2 軸は整数 index、残り 1 軸は面内で一定）の切り出し。
+    補間は面に垂直な 1 軸の 2 枚の線形補間だけで、値は sitk と同じ
+    （端は最近傍で延長、半ボクセルより外は default_val）。乗っていなければ None。
+    """
+    tol = 1e-6
+    ints, frac = [], None
+    for a in range(3):
+        r = np.rint(idx[a])
+        if np.abs(idx[a] - r).max() < tol:
+            ints.append(r)
+        elif frac is None and np.ptp(idx[a]) < tol:
+            ints.append(None)
+            frac = a
+        else:
+            return None  # 斜めの面・ボクセル間隔と合わない出力間隔
+    inside = np.ones(idx.shape[1:], dtype=bool)
+    for a, n_a in enumerate(volume_zyx.shape):
+        inside &= (idx[a] >= -0.5) & (idx[a] < n_a - 0.5)
+    out = np.full(idx.shape[1:], default_val, dtype=np.float32)
+    if not inside.any():
+        return out
+    sel = [None if r is None else r[inside].astype(np.intp) for r in ints]
+    if frac is None:
+        out[inside] = volume_zyx[tuple(sel)]
+        return out
+
+    n_f = volume_zyx.shape[frac]
+    def plane(k):
+        s = list(sel)
+        s[frac] = min(max(k, 0), n_f - 1)
+        return volume_zyx[tuple(s)]
+    t = float(idx[frac].flat[0])
+    if fast:
+        out[inside] = plane(int(np.floor(t + 0.5)))  # sitk の最近傍と同じ四捨五入（.5 は切り上げ）
+    else:
+        k0 = int(np.floor(t))
+        f = t - k0
+        out[inside] = (1.0 - f) * plane(k0) + f * plane(k0 + 1)
+    return out
+
+def _reslice_ndimage(volume_zyx, idx, default_val, fast):
+    """scipy.ndimage.map_coordinates による 1 枚の切り出し（float32 化した全体コピーを作らない）"""
+    out = map_coordinates(volume_zyx, idx, order=0 if fast else 1, mode="nearest",
+                          output=np.float32, prefilter=False)
+    # sitk と同じく、端のボクセル中心から半画素を超えて外に出た点だけ default_val
+    outside = np.zeros(out.shape, dtype=bool)
+    for a, n_a in enumerate(volume_zyx.shape):
+        outside |= (idx[a] < -0.5) | (idx[a] >= n_a - 0.5)
+    out[outside] = default_val
+    return out
+
 def reslice_oblique(
     volume_zyx: np.ndarray,
     spacing_zyx: tuple[float, float, float],
@@ -49,6 +160,7 @@ def reslice_oblique(
     out_spacing_xy: tuple[float, float],
     slab_thickness_mm: float = 1.0,
     default_val: float = 0.0,
+    fast: bool = False,
 ):
     """
     任意平面 MPR を 2.5D で1枚生成（slab_thickness_mm を薄くすると純2D）
@@ -57,14 +169,12 @@ def reslice_oblique(
     - center_mm: 面の中心の物理座標（LPS, mm）
     - normal_xyz: 面法線
     - up_hint_xyz: 面内の「上」方向のヒント
+    - fast: True なら最近傍補間（ドラッグ中のプレビュー用。離したら False で描き直す）
     """
-    # 1) sitk.Image を構築
-    src = build_sitk_image(volume_zyx, spacing_zyx, origin_xyz, direction_9)
-
-    # 2) 面の直交基底を作成（e0:出力X方向, e1:出力Y方向, n:法線＝出力Z方向）
+    # 1) 面の直交基底を作成（e0:出力X方向, e1:出力Y方向, n:法線＝出力Z方向）
     R, e0, e1, n = _orthonormal_basis(normal_xyz, up_hint_xyz)
 
-    # 3) 出力グリッド（方向・原点・間隔・サイズ）
+    # 2) 出力グリッド（方向・原点・間隔・サイズ）
     # 出力画像の方向（3x3行列をフラット）: [e0, e1, n] を列に持つ形で flatten
     out_direction = np.array([e0, e1, n]).T.flatten().tolist()
     sx, sy = float(out_spacing_xy[0]), float(out_spacing_xy[1])
@@ -80,12 +190,24 @@ def reslice_oblique(
         - 0.5 * sz * n
     )
 
-    # 4) リサンプリング（恒等変換でOK。出力グリッドに方向を持たせているため）
+    # 3) 出力画素ごとの元 index。軸に沿った面（Axial/Coronal/Sagittal で間隔もボクセルどおり）なら
+    #    画素の取り出しだけで済ませ、それ以外は scipy があれば直接補間（どちらも sitk.Image を作らない）
+    idx = _plane_indices(volume_zyx.shape, spacing_zyx, origin_xyz, direction_9,
+                         origin_out, e0, e1, nx, ny, sx, sy)
+    aligned = _reslice_aligned(volume_zyx, idx, float(default_val), fast)
+    if aligned is not None:
+        return aligned  # [Y,X]
+    if map_coordinates is not None:
+        return _reslice_ndimage(volume_zyx, idx, float(default_val), fast)  # [Y,X]
+
+    # 4) 無ければ sitk.Image を構築（同じボリューム・幾何なら前回のものを再利用）してリサンプリング
+    #    （恒等変換でOK。出力グリッドに方向を持たせているため）
+    src = _cached_sitk_image(volume_zyx, spacing_zyx, origin_xyz, direction_9)
     out = sitk.Resample(
         src,
         size=(nx, ny, nz),
         transform=sitk.Transform(3, sitk.sitkIdentity),
-        interpolator=sitk.sitkLinear,
+        interpolator=sitk.sitkNearestNeighbor if fast else sitk.sitkLinear,
         outputOrigin=tuple(origin_out.tolist()),
         outputSpacing=(sx, sy, sz),
         outputDirection=tuple(out_direction),
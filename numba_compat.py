@@ -0,0 +1,46 @@
+# numba_compat.py
+"""
+numba（任意依存）の遅延読み込み。import は最初にカーネルを使う時まで遅らせる（起動時間に含めない）。
+numba が無ければカーネルは None になり、呼び出し側は NumPy 実装で同じ結果を返す。
+"""
+from __future__ import annotations
+import threading
+from typing import Callable, Optional
+
+_lock = threading.Lock()
+_numba = None
+_checked = False
+
+def load_numba():
+    """numba モジュール（無ければ None）。初回だけ import を試す。"""
+    global _numba, _checked
+    with _lock:
+        if not _checked:
+            try:
+                import numba
+            except ImportError:
+                numba = None
+            _numba = numba
+            _checked = True
+    return _numba
+
+class lazy_kernel:
+    """
+    build(numba) -> コンパイル済み関数 を包み、初回 get() で numba を読み込んで組み立てる。
+    build の中で @numba.njit を付けて返す（numba.prange はローカル変数に取ってから使う）。
+    """
+    def __init__(self, build: Callable):
+        self._build = build
+        self._kernel: Optional[Callable] = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[Callable]:
+        """カーネル本体。numba が無ければ None。"""
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    nb = load_numba()
+                    self._kernel = self._build(nb) if nb is not None else None
+                    self._built = True
+        return self._kernel
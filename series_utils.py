@@ -0,0 +1,213 @@
+# series_utils.py
+"""
+DICOM フォルダの走査・ヘッダ/画素の読み込み・読み込み済みボリュームのキャッシュ・パーセンタイル。
+app.py / app_qt.py / dicom_io.py で共有する（pydicom は使う関数の中で import するので起動時には読まない）。
+"""
+from __future__ import annotations
+import os
+import hashlib
+import json
+import numpy as np
+
+# ---------- フォルダ走査 ----------
+def _dir_id(path: str):
+    # シンボリックリンクを辿った先のフォルダの (st_dev, st_ino)。stat できなければ None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+def walk_files(root: str):
+    # os.scandir による再帰走査（dirent の種別をそのまま使う）。glob と同じく隠しファイル・隠しフォルダは除き、
+    # フォルダへのシンボリックリンクも辿る。同じフォルダ（(st_dev, st_ino)）は 1 回だけ見てリンクのループを防ぐ
+    visited = {_dir_id(root)}
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                if e.name.startswith("."):
+                    continue
+                if e.is_dir():
+                    d = _dir_id(e.path)
+                    if d is not None and d not in visited:
+                        visited.add(d)
+                        stack.append(e.path)
+                elif e.is_file():
+                    yield e.path
+
+def is_dicom(fp: str) -> bool:
+    # Part 10 のファイルは 128 バイトのプリアンブルの後に "DICM" がある（パースせずに 4 バイト読むだけで判定）
+    try:
+        with open(fp, "rb") as f:
+            f.seek(128)
+            return f.read(4) == b"DICM"
+    except OSError:
+        return False
+
+# ---------- 2 パス読み込み（1: ヘッダ、2: 画素） ----------
+# ヘッダ走査で読むタグ（PixelData は画像かどうかの判定のみ）
+HEADER_TAGS = ["PixelData", "RescaleSlope", "RescaleIntercept", "PixelSpacing", "SliceThickness",
+               "ImagePositionPatient", "SliceLocation", "InstanceNumber"]
+# 画素読み込み（2 パス目）のファイルバッファ
+PIXEL_READ_BUFFER = 1 << 16
+
+def read_header(fp: str):
+    """
+    1 パス目: (path, slope, intercept, ipp, slice_location, instance, spacing)。
+    ipp / slice_location / instance / spacing（(Z,Y,X)）は取れなければ None（既定値は呼び出し側で決める）。
+    PixelData の無いファイル・読めないファイルは None。
+    """
+    import pydicom
+    try:
+        # 必要なタグだけ解析し、1 KB を超える要素（PixelData）は位置だけ覚えて読まない
+        ds = pydicom.dcmread(fp, force=True, defer_size="1 KB", specific_tags=HEADER_TAGS)
+    except Exception:
+        return None
+    if "PixelData" not in ds:
+        return None
+    slope = float(getattr(ds, "RescaleSlope", 1.0))
+    intercept = float(getattr(ds, "RescaleIntercept", 0.0))
+    try:
+        v = [float(x) for x in ds.ImagePositionPatient]
+        ipp = (v[0], v[1], v[2])
+    except Exception:
+        ipp = None
+    try:
+        slice_location = float(ds.SliceLocation)
+    except Exception:
+        slice_location = None
+    try:
+        inst = int(ds.InstanceNumber)
+    except Exception:
+        inst = None
+    try:
+        py, px = [float(x) for x in ds.PixelSpacing]
+        pz = float(getattr(ds, "SliceThickness", 1.0))
+        spacing = (pz, py, px)
+    except Exception:
+        spacing = None
+    return fp, slope, intercept, ipp, slice_location, inst, spacing
+
+def read_pixels(fp: str) -> np.ndarray:
+    """2 パス目: 1 ファイルの画素（Rescale 前の格納値）"""
+    import pydicom
+    # ファイル全体を読むので、既定の 8 KiB ではなく 64 KiB バッファで小さな読み出しのシステムコールを減らす
+    with open(fp, "rb", buffering=PIXEL_READ_BUFFER) as f:
+        return pydicom.dcmread(f, force=True).pixel_array
+
+# ---------- 読み込み済みボリュームのキャッシュ（<ユーザーのキャッシュフォルダ>/viewer/<hash>.npy + .json） ----------
+# DICOM フォルダ（共有・ネットワーク上のこともある）には書かない。<hash> は読み込み側の名前空間とフォルダの絶対パスから作る。
+# 合計が VIEWER_CACHE_MAX_MB（既定 4096）を超えたら古く使ったものから消す。VIEWER_CACHE_DIR で場所を変更、
+# VIEWER_NO_CACHE=1 で無効
+def _cache_max_bytes() -> int:
+    try:
+        mb = int(os.environ.get("VIEWER_CACHE_MAX_MB", "4096"))
+    except ValueError:
+        mb = 4096
+    return (mb if mb > 0 else 4096) << 20
+
+CACHE_MAX_BYTES = _cache_max_bytes()
+
+def cache_enabled() -> bool:
+    return os.environ.get("VIEWER_NO_CACHE", "0") != "1"
+
+def cache_dir() -> str:
+    d = os.environ.get("VIEWER_CACHE_DIR")
+    if d:
+        return d
+    base = os.environ.get("LOCALAPPDATA") if os.name == "nt" else os.environ.get("XDG_CACHE_HOME")
+    return os.path.join(base or os.path.join(os.path.expanduser("~"), ".cache"), "viewer")
+
+def _cache_paths(dcmdir: str, namespace: str):
+    # namespace: 読み込み側ごとの名前（spacing/origin の決め方が違うので app.py と app_qt.py で分ける）
+    h = hashlib.sha1(f"{namespace}\0{os.path.abspath(dcmdir)}".encode()).hexdigest()
+    stem = os.path.join(cache_dir(), h)
+    return stem + ".npy", stem + ".json"
+
+def cache_key(files):
+    # 全候補ファイルのパス・サイズ・更新時刻。追加・削除・書き換えがあれば作り直す。
+    # 走査後に消えた・名前が変わったファイルがあれば None（今回はキャッシュを使わずに読む）
+    h = hashlib.sha1()
+    for f in files:
+        try:
+            st = os.stat(f)
+        except OSError:
+            return None
+        h.update(f"{f}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+def load_cached_volume(dcmdir: str, namespace: str, key: str):
+    """(vol, spacing, origin)。無い・key が違う・壊れているときは None"""
+    npy, js = _cache_paths(dcmdir, namespace)
+    try:
+        with open(js, encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("key") != key:
+            return None
+        # メモリマップで開く（読んだページだけ OS のページキャッシュから載る。読み取り専用）
+        vol = np.load(npy, mmap_mode="r")
+        result = vol, tuple(info["spacing"]), tuple(info["origin"])
+    except Exception:
+        return None
+    try:
+        os.utime(npy)  # 更新時刻を「最後に使った時刻」として追い出しの順に使う
+    except OSError:
+        pass
+    return result
+
+def save_cached_volume(dcmdir: str, namespace: str, key: str, vol, spacing, origin):
+    if vol.nbytes > CACHE_MAX_BYTES:
+        return  # 上限より大きいものは入れない（入れてもすぐ他を全部追い出すだけ）
+    npy, js = _cache_paths(dcmdir, namespace)
+    try:
+        os.makedirs(os.path.dirname(npy), exist_ok=True)
+        # 一時ファイルに書いてから rename（書きかけのキャッシュを読ませない）
+        with open(npy + ".tmp", "wb") as f:
+            np.save(f, vol)
+        os.replace(npy + ".tmp", npy)
+        with open(js + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"key": key, "dir": os.path.abspath(dcmdir),
+                       "spacing": list(spacing), "origin": list(origin)}, f)
+        os.replace(js + ".tmp", js)
+    except OSError:
+        return  # 書けない環境ではキャッシュしないだけ
+    _evict_cache(keep=npy)
+
+def _evict_cache(keep: str):
+    # 最後に使った時刻の新しい順に上限まで残し、残りを消す（いま書いた keep は必ず残す）
+    try:
+        entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in os.scandir(cache_dir())
+                   if e.name.endswith(".npy") and e.is_file()]
+    except OSError:
+        return
+    total = 0
+    for _, size, path in sorted(entries, reverse=True):
+        if path == keep or total + size <= CACHE_MAX_BYTES:
+            total += size
+            continue
+        try:
+            os.remove(path)  # 開いている（メモリマップ中の）ものは Windows では消せないので残す
+            os.remove(path[:-4] + ".json")
+        except OSError:
+            pass
+
+# ---------- WL/WW 初期値用のパーセンタイル ----------
+def histogram_percentiles(vol: np.ndarray, qs):
+    # ソートせずヒストグラムの累積和から求める（1 パスの O(N)）。
+    # 整数は 1 値 1 ビン（最近傍順位で厳密）、float は 4096 ビン
+    lo, hi = float(vol.min()), float(vol.max())
+    if hi <= lo:
+        return [lo] * len(qs)
+    if vol.dtype.kind in "iu":
+        bins, hi = int(min(hi - lo + 1, 65536)), hi + 1
+    else:
+        bins = 4096
+    hist, edges = np.histogram(vol, bins=bins, range=(lo, hi))
+    cdf = np.cumsum(hist)
+    idx = np.searchsorted(cdf, np.asarray(qs, dtype=np.float64) / 100.0 * cdf[-1])
+    return edges[idx]
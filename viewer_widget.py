@@ -5,22 +5,91 @@ import numpy as np
 from PySide6.QtWidgets import QLabel
 from PySide6.QtGui import QImage, QPixmap
 from PySide6.QtCore import Qt, QSize
+from numba_compat import lazy_kernel
 
-def apply_window_level(img: np.ndarray, level: float, width: float, invert: bool=False) -> np.ndarray:
+@lazy_kernel
+def _wl_kernel(nb):
+    prange = nb.prange
+
+    @nb.njit(parallel=True, fastmath=True, cache=True)
+    def kernel(img, low, scale, invert, out):
+        # 減算・スケール・クリップ・uint8 化を1パスで行う（一時配列なし）
+        for i in prange(img.shape[0]):
+            for j in range(img.shape[1]):
+                v = (img[i, j] - low) * scale
+                if v < 0.0:
+                    v = 0.0
+                elif v > 255.0:
+                    v = 255.0
+                u = np.uint8(v)
+                out[i, j] = 255 - u if invert else u
+    return kernel
+
+@lazy_kernel
+def _hist_kernel(nb):
+    @nb.njit(cache=True)
+    def kernel(img, lo, scale, out):
+        # 2D（間引きビューのままでよい）をそのまま走査して out にヒストグラムを数える
+        out[:] = 0
+        for i in range(img.shape[0]):
+            for j in range(img.shape[1]):
+                b = int((img[i, j] - lo) * scale)
+                if 0 <= b < out.size:
+                    out[b] += 1
+    return kernel
+
+def apply_window_level(img: np.ndarray, level: float, width: float, invert: bool=False,
+                       out: Optional[np.ndarray]=None) -> np.ndarray:
     """
     16bit相当の画素値に WL/WW を適用して uint8 に変換。
     invert=True のとき（MONOCHROME1）は出力を反転。
+    out を渡すとその uint8 配列（img と同形状）に書き込んで返す。
     """
-    img = img.astype(np.float32)
     width = max(float(width), 1.0)  # 0除算回避
-    low  = level - width / 2.0
-    high = level + width / 2.0
-    norm = (img - low) / (high - low)
+    low  = float(level) - width / 2.0
+    if out is None:
+        out = np.empty(img.shape, dtype=np.uint8)
+    kernel = _wl_kernel.get()
+    if kernel is not None:
+        kernel(img, low, 255.0 / width, bool(invert), out)
+        return out
+    norm = (img.astype(np.float32) - low) / width
     norm = np.clip(norm, 0.0, 1.0)
-    u8 = (norm * 255.0).astype(np.uint8)
+    out[...] = norm * 255.0
     if invert:
-        u8 = 255 - u8
-    return u8
+        np.subtract(255, out, out=out)
+    return out
+
+def _build_lut(dtype: np.dtype, level: float, width: float, invert: bool) -> np.ndarray:
+    """
+    8/16bit 整数画像用の WL/WW 参照表。画素を同幅の符号なし整数として見た値で引く
+    （int16 の負値も 2 の補数のまま index になる）。
+    """
+    udtype = np.dtype(f"u{np.dtype(dtype).itemsize}")
+    values = np.arange(1 << (8 * udtype.itemsize), dtype=udtype).view(dtype)
+    return apply_window_level(values.reshape(1, -1), level, width, invert=invert).ravel()
+
+def _fast_percentile(arr: np.ndarray, qs, bins: int = 1024, hist: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    ヒストグラム＋累積和による近似パーセンタイル（ソート不要の O(N)）。
+    精度は (max-min)/bins 程度で、WL/WW の初期値推定には十分。
+    hist に int64 の作業配列（長さ bins）を渡すと毎回確保せずに使い回す。
+    """
+    lo = float(arr.min())
+    hi = float(arr.max())
+    if hi <= lo:
+        return np.full(len(qs), lo)
+    scale = (bins - 1) / (hi - lo)
+    if hist is None:
+        hist = np.empty(bins, dtype=np.int64)
+    kernel = _hist_kernel.get() if arr.ndim == 2 else None
+    if kernel is not None:
+        kernel(arr, lo, scale, hist)
+    else:
+        hist[:] = np.bincount(((arr.ravel() - lo) * scale).astype(np.int32), minlength=bins)
+    cdf = np.cumsum(hist, out=hist)
+    ranks = (np.asarray(qs, dtype=np.float64) / 100.0 * (arr.size - 1)).astype(np.int64)
+    return lo + np.searchsorted(cdf, ranks, side="right") / scale
 
 class ImageView(QLabel):
     """
@@ -31,16 +100,33 @@ class ImageView(QLabel):
         self.setAlignment(Qt.AlignCenter)
         self.setMinimumSize(QSize(200, 200))
 
-        self._img2d: Optional[np.ndarray] = None  # 元の 2D float32（HU 等）
+        self._img2d: Optional[np.ndarray] = None  # 元の 2D（8/16bit 整数 or float32。HU 等）
         self._wl: float = 40.0                    # デフォルト（後でセット）
         self._ww: float = 400.0
         self._invert: bool = False                # MONOCHROME1 のとき True
 
         self._orig_pixmap: Optional[QPixmap] = None
+        self._u8: Optional[np.ndarray] = None     # WL/WW 適用後の 8bit 画像（形状が変わるまで使い回す）
+        self._lut: Optional[np.ndarray] = None    # 整数画像用の WL/WW 参照表
+        self._lut_key = None                      # (dtype, wl, ww, invert)
+        self._hist_buf = np.empty(1024, dtype=np.int64)  # 自動 WL/WW 用ヒストグラムの作業配列
+        self._step: int = 1                       # 表示用の間引き間隔（ウィジェットより十分大きい画像のみ >1）
+        self._render_key = None                   # 直近の 8bit 化 (間引き, wl, ww, invert)。set_slice で無効化
+        self._scaled_key = None                   # 直近の拡縮 (pixmap の cacheKey, 幅, 高さ, 補間)
+        self._interactive: bool = False           # WL/WW ドラッグ中などは高速補間で拡縮する
 
     def set_monochrome_mode(self, photometric: str):
         self._invert = (str(photometric).upper() == "MONOCHROME1")
 
+    def begin_interactive(self):
+        """連続操作（WL/WW ドラッグ等）の開始。終わるまで拡縮は FastTransformation。"""
+        self._interactive = True
+
+    def end_interactive(self):
+        """連続操作の終了。最後の画像を SmoothTransformation で拡縮し直す。"""
+        self._interactive = False
+        self._update_scaled_pixmap()
+
     def set_wl_ww(self, level: float, width: float):
         self._wl = float(level)
         self._ww = max(float(width), 1.0)
@@ -49,7 +135,9 @@ class ImageView(QLabel):
     def set_slice(self, img2d: np.ndarray, wl: Optional[float]=None, ww: Optional[float]=None):
         if img2d.ndim != 2:
             raise ValueError("2D画像を渡してください")
-        self._img2d = img2d.astype(np.float32)
+        # 8/16bit 整数はそのまま保持して参照表で変換、それ以外は float32 に揃える
+        self._img2d = img2d if img2d.dtype.kind in "iu" and img2d.dtype.itemsize <= 2 else img2d.astype(np.float32)
+        self._render_key = None  # 同じ配列の書き換えもあり得るので、スライスが来たら必ず作り直す
 
         if wl is not None:
             self._wl = float(wl)
@@ -57,8 +145,9 @@ class ImageView(QLabel):
             self._ww = max(float(ww), 1.0)
 
         # 値が未設定ならパーセンタイルからざっくり初期化（CTなら後で上書きされる想定）
+        # 初期値の推定なので 4 画素おきの間引きで十分（読む量が 1/16）
         if wl is None or ww is None:
-            p1, p99 = np.percentile(self._img2d, [1, 99])
+            p1, p99 = _fast_percentile(self._img2d[::4, ::4], [1, 99], hist=self._hist_buf)
             if ww is None:
                 self._ww = max(float(p99 - p1), 1.0)
             if wl is None:
@@ -68,19 +157,52 @@ class ImageView(QLabel):
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self._update_scaled_pixmap()
+        # 間引き間隔が変わるときだけ作り直す（それ以外は既存 pixmap の拡縮のみ）
+        if self._img2d is not None and self._display_step() != self._step:
+            self._render()
+        else:
+            self._update_scaled_pixmap()
+
+    def _display_step(self) -> int:
+        # 画像がウィジェットの 2 倍以上あるとき、縦横とも表示画素数を下回らない範囲で間引く
+        h, w = self._img2d.shape
+        return max(1, min(w // max(self.width(), 1), h // max(self.height(), 1)))
 
     def _render(self):
         if self._img2d is None:
             return
-        u8 = apply_window_level(self._img2d, self._wl, self._ww, invert=self._invert)
+        self._step = self._display_step()
+        # スライス・間引き・WL/WW・反転が前回と同じなら 8bit 化をやり直さない（拡縮だけ確認）
+        render_key = (self._step, self._wl, self._ww, self._invert)
+        if render_key == self._render_key:
+            self._update_scaled_pixmap()
+            return
+        self._render_key = render_key
+        img = self._img2d[::self._step, ::self._step] if self._step > 1 else self._img2d
+        if self._u8 is None or self._u8.shape != img.shape:
+            self._u8 = np.empty(img.shape, dtype=np.uint8)
+        if img.dtype.kind in "iu":
+            key = (img.dtype, self._wl, self._ww, self._invert)
+            if key != self._lut_key:
+                self._lut = _build_lut(img.dtype, self._wl, self._ww, self._invert)
+                self._lut_key = key
+            u8 = np.take(self._lut, img.view(f"u{img.dtype.itemsize}"), out=self._u8, mode="clip")
+        else:
+            u8 = apply_window_level(img, self._wl, self._ww, invert=self._invert, out=self._u8)
         h, w = u8.shape
+        # self._u8 を直接包む QImage（コピーなし）。fromImage が Qt 側へ 1 回だけ複製する
         qimg = QImage(u8.data, w, h, w, QImage.Format_Grayscale8)
-        self._orig_pixmap = QPixmap.fromImage(qimg.copy())
+        self._orig_pixmap = QPixmap.fromImage(qimg)
         self._update_scaled_pixmap()
 
     def _update_scaled_pixmap(self):
         if not self._orig_pixmap:
             return
-        scaled = self._orig_pixmap.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        mode = Qt.FastTransformation if self._interactive else Qt.SmoothTransformation
+        # 元画像・ウィジェットサイズ・補間が同じなら拡縮し直さない（同サイズの resizeEvent 等）
+        key = (self._orig_pixmap.cacheKey(), self.width(), self.height(), mode)
+        if key == self._scaled_key:
+            return
+        self._scaled_key = key
+        scaled = self._orig_pixmap.scaled(self.size(), Qt.KeepAspectRatio, mode)
         self.setPixmap(scaled)
\ No newline at end of file
@@ -2,7 +2,7 @@
 from __future__ import annotations
 import numpy as np
 from PySide6.QtWidgets import QWidget, QVBoxLayout
-from PySide6.QtCore import QTimer
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
 import os
 
 # VTK (Qt interop + core)
@@ -13,10 +13,87 @@ from vtkmodules.vtkRenderingCore import (
     vtkVolumeProperty,
     vtkColorTransferFunction,
 )
-from vtkmodules.vtkRenderingVolumeOpenGL2 import vtkSmartVolumeMapper
-from vtkmodules.vtkCommonDataModel import vtkImageData, vtkPiecewiseFunction
+from vtkmodules.vtkRenderingVolumeOpenGL2 import vtkSmartVolumeMapper, vtkMultiBlockVolumeMapper
+from vtkmodules.vtkCommonDataModel import vtkImageData, vtkPiecewiseFunction, vtkMultiBlockDataSet
 from vtkmodules.util.numpy_support import numpy_to_vtk
 import vtk  # for VTK_* type ids
+from numba_compat import lazy_kernel
+
+
+@lazy_kernel
+def _block_mean_kernel(nb):
+    prange = nb.prange
+
+    @nb.njit(parallel=True, cache=True)
+    def kernel(vol, f, out):
+        # one streaming pass over the source: each output voxel sums its f^3 block (int64)
+        # and rounds the mean to nearest; z-blocks run in parallel
+        n = f * f * f
+        for zb in prange(out.shape[0]):
+            for yb in range(out.shape[1]):
+                for xb in range(out.shape[2]):
+                    s = 0
+                    for dz in range(f):
+                        for dy in range(f):
+                            for dx in range(f):
+                                s += vol[zb * f + dz, yb * f + dy, xb * f + dx]
+                    out[zb, yb, xb] = np.rint(s / n)
+    return kernel
+
+# VIEWER_VTK_DEBUG=1: progress prints and the reference axes in set_volume (errors always print)
+DEBUG = os.environ.get("VIEWER_VTK_DEBUG", "0") == "1"
+
+
+def _debug(*args):
+    if DEBUG:
+        print(*args)
+
+
+# Largest volume (MB) uploaded to the GPU as one 3D texture; bigger ones are split into Z bricks
+# of at most this size and drawn with vtkMultiBlockVolumeMapper
+def _gpu_budget_bytes(default_mb: int = 2048) -> int:
+    # a malformed or non-positive VIEWER_VTK_GPU_BUDGET_MB falls back to the default instead of
+    # failing the import
+    raw = os.environ.get("VIEWER_VTK_GPU_BUDGET_MB", str(default_mb))
+    try:
+        mb = int(raw)
+    except ValueError:
+        mb = 0
+    if mb <= 0:
+        print(f"[VTK] ignoring VIEWER_VTK_GPU_BUDGET_MB={raw!r}; using {default_mb} MB")
+        mb = default_mb
+    return mb << 20
+
+
+GPU_BUDGET_BYTES = _gpu_budget_bytes()
+
+# numpy dtypes handed to VTK as is (zero copy); everything else goes through float32
+_VTK_TYPES = {np.dtype(np.int16): vtk.VTK_SHORT, np.dtype(np.uint16): vtk.VTK_UNSIGNED_SHORT,
+              np.dtype(np.uint8): vtk.VTK_UNSIGNED_CHAR}
+
+
+class _VolumePrepSignals(QObject):
+    done = Signal(int, object)    # (job_id, (vol, spacing_zyx, origin_xyz, step))
+    failed = Signal(int, str)     # (job_id, message)
+
+
+class VolumePrepJob(QRunnable):
+    """Downsample/dtype steps of set_volume on a worker thread (NumPy only, no VTK/GL)."""
+
+    def __init__(self, job_id: int, prepare):
+        super().__init__()
+        self.job_id = job_id
+        self.prepare = prepare
+        # created on the GUI thread, so done/failed reach the view as queued calls
+        self.signals = _VolumePrepSignals()
+
+    def run(self):
+        try:
+            prepared = self.prepare()
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.done.emit(self.job_id, prepared)
 
 
 class VTKVolumeView(QWidget):
@@ -26,7 +103,7 @@ class VTKVolumeView(QWidget):
 
     def show_axes_test(self):
         """Render a minimal scene (axes only) to verify the rendering path works."""
-        print("[VTK] axes test render start")
+        _debug("[VTK] axes test render start")
         try:
             from vtkmodules.vtkRenderingAnnotation import vtkAxesActor
             self.ren.RemoveAllViewProps()
@@ -34,28 +111,18 @@ class VTKVolumeView(QWidget):
             axes.SetTotalLength(50, 50, 50)
             self.ren.AddActor(axes)
             self.ren.ResetCamera()
-            self.ren_win.Render()
-            from PySide6.QtWidgets import QApplication
-            try:
-                QApplication.processEvents()
-            except Exception:
-                pass
-            try:
-                from PySide6.QtCore import QTimer as _QT
-                _QT.singleShot(0, self.ren_win.Render)
-            except Exception:
-                pass
-            print("[VTK] axes test render done")
+            self.request_render()
+            _debug("[VTK] axes test render scheduled")
         except Exception as e:
             print("[VTK] axes test failed:", e)
 
     def __init__(self, parent=None):
-        print("[VTK] VTKVolumeView.__init__ start")
+        _debug("[VTK] VTKVolumeView.__init__ start")
         super().__init__(parent)
 
         # Qt widget hosting VTK render window
         self.vtk_widget = QVTKRenderWindowInteractor(self)
-        print("[VTK] QVTKRenderWindowInteractor created")
+        _debug("[VTK] QVTKRenderWindowInteractor created")
         lay = QVBoxLayout(self)
         lay.setContentsMargins(0, 0, 0, 0)
         lay.addWidget(self.vtk_widget)
@@ -70,7 +137,13 @@ class VTKVolumeView(QWidget):
             self.ren_win.SetAlphaBitPlanes(1)
         except Exception:
             pass
-        print("[VTK] renderer attached")
+        _debug("[VTK] renderer attached")
+
+        # Deferred render: every request in the same event-loop pass collapses into one Render()
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.setInterval(0)
+        self._render_timer.timeout.connect(self._render_now)
 
         # Interactor init (synchronous for stability)
         self.iren = self.ren_win.GetInteractor()
@@ -78,41 +151,61 @@ class VTKVolumeView(QWidget):
 
         # State
         self._actor: vtkVolume | None = None
+        # Image/mapper of the current volume, reused while the geometry stays the same
+        self._vtk_img: vtkImageData | None = None
+        self._vol_key = None
+        # Background volume prep, one job at a time; the id drops results superseded by a newer
+        # set_volume/set_volume_async call
+        self._prep_pool = QThreadPool(self)
+        self._prep_pool.setMaxThreadCount(1)
+        self._volume_job_id = 0
+        self._volume_job = None
+        self._volume_opts = None
         self._wl = 40.0
         self._ww = 400.0
         self._photometric = "MONOCHROME2"
-        print("[VTK] VTKVolumeView.__init__ end (deferred init)")
+        # WL/WW transfer functions shared by every volume; refilled in place only when
+        # WL/WW or photometric change (VTK samples them into its own lookup table)
+        self._ctf = vtkColorTransferFunction()
+        self._otf = vtkPiecewiseFunction()
+        self._tf_key = None
+        # quantize=True: WL/WW baked into a uint8 copy (_q_buf) of the prepared volume (_q_src);
+        # WL/WW changes rewrite _q_buf in place, the transfer functions then span 0..255
+        self._q_src: np.ndarray | None = None
+        self._q_buf: np.ndarray | None = None
+        self._vtk_data = None  # what the mapper reads: _vtk_img or the brick set
+        # Z slab (first, last slice in set_volume's indexing) the ray casting is cropped to, kept
+        # across volumes like WL/WW; _z_frame = (origin z, slice spacing) of that indexing
+        self._slab: tuple[int, int] | None = None
+        self._z_frame = (0.0, 1.0)
+        # world bounds the camera was last framed on; a new pipeline over the same extent
+        # (blending/quality/quantize switch, same-size series) keeps the user's camera
+        self._camera_bounds = None
+        _debug("[VTK] VTKVolumeView.__init__ end (deferred init)")
 
     def _init_interactor(self):
-        print("[VTK] interactor init start")
+        _debug("[VTK] interactor init start")
         try:
-            # Disable MSAA to reduce driver quirks
-            try:
-                self.ren_win.SetMultiSamples(0)
-            except Exception:
-                pass
+            # MSAA is already off (__init__); don't call Start() in Qt apps
             self.vtk_widget.Initialize()
-            # Don't call Start() in Qt apps
-            self.ren_win.Render()
-            # Process queued events to keep UI responsive
-            from PySide6.QtWidgets import QApplication
-            try:
-                QApplication.processEvents()
-            except Exception:
-                pass
-            print("[VTK] interactor init done")
-            self.show()  # ensure widget becomes visible
-            self.ren_win.Render()
-            try:
-                self.vtk_widget.update()
-                self.vtk_widget.repaint()
-            except Exception:
-                pass
+            self.show()  # ensure widget becomes visible; Qt's paint events take it from here
+            self.ren_win.Render()  # the one synchronous render, on window creation
+            _debug("[VTK] interactor init done")
         except Exception as e:
             print("[VTK] interactor init skipped:", e)
 
 
+    def _render_now(self):
+        try:
+            self.ren_win.Render()
+        except Exception as e:
+            print("[VTK] render skipped:", e)
+
     # ---------------- public API ----------------
+    def request_render(self):
+        """Schedule one Render() on the next event-loop pass (repeated calls coalesce)."""
+        self._render_timer.start()
+
     def set_photometric(self, photometric: str):
         self._photometric = str(photometric).upper()
 
@@ -120,10 +213,75 @@ class VTKVolumeView(QWidget):
         self._wl, self._ww = float(wl), max(float(ww), 1.0)
         if self._actor is None:
             return
-        low = float(self._wl - self._ww / 2.0)
-        high = float(self._wl + self._ww / 2.0)
+        if self._q_src is not None:
+            # quantized volume: WL/WW lives in the voxels, re-quantize into the same buffer
+            self._quantize_into(self._q_src, self._q_buf)
+            self._touch_scalars()
+            self._update_transfer_functions()  # photometric may have changed
+        elif not self._update_transfer_functions():
+            return
+        self.request_render()
+
+    def set_slab(self, z0: int | None, z1: int | None = None):
+        """Limit ray casting to slices z0..z1 (inclusive, set_volume's Z index) with the mapper's
+        cropping planes: the volume stays uploaded. set_slab(None) shows the whole volume."""
+        self._slab = None if z0 is None else (int(z0), int(z1 if z1 is not None else z0))
+        if self._actor is not None:
+            self._apply_slab()
+            self.request_render()
+
+    def _apply_slab(self):
+        mapper = self._actor.GetMapper()
+        if self._slab is None:
+            mapper.SetCropping(False)
+            return
+        oz, sz = self._z_frame
+        lo, hi = sorted((oz + self._slab[0] * sz, oz + self._slab[1] * sz))
+        half = abs(sz) * 0.5  # whole slices: out to the half-way point to the neighbours
+        b = mapper.GetBounds()
+        mapper.SetCroppingRegionPlanes(b[0], b[1], b[2], b[3], lo - half, hi + half)
+        mapper.SetCroppingRegionFlagsToSubVolume()
+        mapper.SetCropping(True)
+
+    def _quantize_into(self, src: np.ndarray, out: np.ndarray):
+        """Window src with the current WL/WW into the uint8 array out (0 = low, 255 = high)."""
+        low = self._wl - self._ww * 0.5
+        scale = 255.0 / self._ww
+        if src.dtype.kind in "iu" and src.itemsize <= 2:
+            # 8/16-bit: one table entry per possible value, then a single gather
+            udtype = np.dtype(f"u{src.itemsize}")
+            values = np.arange(1 << (8 * src.itemsize), dtype=udtype).view(src.dtype)
+            lut = np.clip(np.rint((values - low) * scale), 0, 255).astype(np.uint8)
+            np.take(lut, src.view(udtype), out=out)
+        else:
+            out[...] = np.clip(np.rint((src.astype(np.float32) - low) * scale), 0, 255)
+
+    def _touch_scalars(self):
+        # the voxels were rewritten in place: have the mapper(s) upload them again
+        data = self._vtk_data
+        if isinstance(data, vtkImageData):
+            images = [data]
+        else:
+            images = [data.GetBlock(i) for i in range(data.GetNumberOfBlocks())]
+        for img in images:
+            img.GetPointData().GetScalars().Modified()
 
-        ctf = vtkColorTransferFunction()
+    def _update_transfer_functions(self) -> bool:
+        """Refill the shared transfer functions from WL/WW; False when they are already current."""
+        if self._q_src is not None:
+            # quantized: the window is already applied, the functions just span the uint8 range
+            key = (None, None, self._photometric)
+            low, mid, high = 0.0, 127.5, 255.0
+        else:
+            key = (self._wl, self._ww, self._photometric)
+            hw = self._ww * 0.5  # _wl/_ww are already floats (set_wl_ww)
+            low, mid, high = self._wl - hw, self._wl, self._wl + hw
+        if key == self._tf_key:
+            return False
+        self._tf_key = key
+
+        ctf = self._ctf
+        ctf.RemoveAllPoints()
         if self._photometric == "MONOCHROME1":
             ctf.AddRGBPoint(low, 1.0, 1.0, 1.0)
             ctf.AddRGBPoint(high, 0.0, 0.0, 0.0)
@@ -131,18 +289,53 @@ class VTKVolumeView(QWidget):
             ctf.AddRGBPoint(low, 0.0, 0.0, 0.0)
             ctf.AddRGBPoint(high, 1.0, 1.0, 1.0)
 
-        otf = vtkPiecewiseFunction()
+        otf = self._otf
+        otf.RemoveAllPoints()
         otf.AddPoint(low, 0.0)
-        otf.AddPoint((low + high) / 2.0, 0.2)
+        otf.AddPoint(mid, 0.2)
         otf.AddPoint(high, 1.0)
+        return True
 
-        prop = self._actor.GetProperty()
-        prop.SetColor(ctf)
-        prop.SetScalarOpacity(otf)
-        try:
-            self.ren_win.Render()
-        except Exception:
-            pass
+    @staticmethod
+    def _set_scalars(vtk_img: vtkImageData, vol: np.ndarray):
+        # VTK runs X fastest, then Y, then Z == C order of (Z, Y, X): share the buffer, no transpose/copy
+        arr = np.ascontiguousarray(vol).reshape(-1)
+        # 16-bit scalars upload as a 16-bit texture; only other dtypes pay for a float32 one
+        vtk_type = _VTK_TYPES.get(vol.dtype, vtk.VTK_FLOAT)
+        if vtk_type == vtk.VTK_FLOAT and arr.dtype != np.float32:
+            arr = arr.astype(np.float32)
+        old = getattr(vtk_img, "_numpy_ref", None)
+        if old is not None and old.__array_interface__["data"][0] == arr.__array_interface__["data"][0]:
+            # same buffer rewritten in place: just tell the mapper to re-upload it
+            vtk_img.GetPointData().GetScalars().Modified()
+            return
+        vtk_arr = numpy_to_vtk(arr, deep=False, array_type=vtk_type)
+        vtk_arr.SetName("values")
+        vtk_img.GetPointData().SetScalars(vtk_arr)
+        vtk_img._numpy_ref = arr  # the VTK array borrows this buffer; keep it alive with the image
+
+    @classmethod
+    def _make_bricks(cls, vol: np.ndarray, spacing_xyz, origin_xyz, max_bytes: int) -> vtkMultiBlockDataSet:
+        # Z slabs of a C-ordered (Z, Y, X) array are contiguous, so every brick shares the buffer.
+        # Neighbouring bricks share one plane so interpolation is continuous across the seams
+        z, y, x = vol.shape
+        sx, sy, sz = spacing_xyz
+        ox, oy, oz = origin_xyz
+        plane_bytes = y * x * (vol.itemsize if vol.dtype in _VTK_TYPES else 4)
+        slab = max(2, max_bytes // max(plane_bytes, 1))
+        bricks = vtkMultiBlockDataSet()
+        z0 = 0
+        while True:
+            z1 = min(z, z0 + slab)
+            img = vtkImageData()
+            img.SetDimensions(int(x), int(y), int(z1 - z0))
+            img.SetSpacing(sx, sy, sz)
+            img.SetOrigin(ox, oy, oz + z0 * sz)
+            cls._set_scalars(img, vol[z0:z1])
+            bricks.SetBlock(bricks.GetNumberOfBlocks(), img)
+            if z1 >= z:
+                return bricks
+            z0 = z1 - 1
 
     def set_volume(
         self,
@@ -151,147 +344,256 @@ class VTKVolumeView(QWidget):
         origin_xyz,
         *,
         downsample: int = 2,
+        downsample_mode: str = "stride",
         prefer_int16: bool = True,
+        assume_safe: bool = False,
         blending: str = "mip",
+        quality: str = "normal",
+        quantize: bool = False,
     ):
-        print("[VTK] set_volume", vol_zyx.shape, spacing_zyx)
+        _debug("[VTK] set_volume", vol_zyx.shape, spacing_zyx)
+        self._check_volume_args(vol_zyx, downsample_mode, quality)
+        self._volume_job_id += 1  # supersedes any set_volume_async still being prepared
+        prepared = self._prepare_volume(vol_zyx, spacing_zyx, origin_xyz, downsample,
+                                        downsample_mode, prefer_int16, assume_safe)
+        self._show_volume(*prepared, blending=blending, quality=quality, quantize=quantize,
+                          z_frame=(float(origin_xyz[2]), float(spacing_zyx[0])))
+
+    def set_volume_async(
+        self,
+        vol_zyx: np.ndarray,
+        spacing_zyx,
+        origin_xyz,
+        *,
+        downsample: int = 2,
+        downsample_mode: str = "stride",
+        prefer_int16: bool = True,
+        assume_safe: bool = False,
+        blending: str = "mip",
+        quality: str = "normal",
+        quantize: bool = False,
+    ):
+        """Like set_volume, but the downsample/dtype steps run on a worker thread and the VTK
+        part (image, mapper, render) follows on the GUI thread. Only the latest call is shown."""
+        _debug("[VTK] set_volume_async", vol_zyx.shape, spacing_zyx)
+        self._check_volume_args(vol_zyx, downsample_mode, quality)
+        self._volume_job_id += 1
+        self._volume_opts = {"blending": blending, "quality": quality, "quantize": quantize,
+                             "z_frame": (float(origin_xyz[2]), float(spacing_zyx[0]))}
+        job = VolumePrepJob(
+            self._volume_job_id,
+            # NumPy block mean here: numba's parallel pool first started from a worker thread
+            # (TBB layer) keeps the interpreter from exiting
+            lambda: self._prepare_volume(vol_zyx, spacing_zyx, origin_xyz, downsample,
+                                         downsample_mode, prefer_int16, assume_safe,
+                                         use_kernel=False),
+        )
+        job.signals.done.connect(self._on_volume_prepared)
+        job.signals.failed.connect(self._on_volume_prep_failed)
+        self._volume_job = job  # keep the Python side alive until it reports back
+        # drop preps still waiting in the queue: they would only produce stale results
+        # (the one already running is discarded by the job id check when it finishes)
+        self._prep_pool.clear()
+        self._prep_pool.start(job)
+
+    def _on_volume_prepared(self, job_id: int, prepared):
+        if job_id != self._volume_job_id:
+            return  # superseded by a later set_volume/set_volume_async
+        self._volume_job = None
+        self._show_volume(*prepared, **self._volume_opts)
 
-        # Guard: ensure non-empty and C-contiguous input
+    def _on_volume_prep_failed(self, job_id: int, msg: str):
+        if job_id != self._volume_job_id:
+            return
+        self._volume_job = None
+        print("[VTK] volume prep failed:", msg)
+
+    @staticmethod
+    def _check_volume_args(vol_zyx, downsample_mode: str, quality: str):
         if vol_zyx is None or vol_zyx.size == 0:
             raise ValueError("Empty volume passed to set_volume")
-        if not vol_zyx.flags.c_contiguous:
-            vol_zyx = np.ascontiguousarray(vol_zyx)
+        if downsample_mode not in ("stride", "block", "none"):
+            raise ValueError(f"Unknown downsample_mode: {downsample_mode!r}")
+        if quality not in ("normal", "fast"):
+            raise ValueError(f"Unknown quality: {quality!r}")
 
+    @staticmethod
+    def _prepare_volume(vol_zyx, spacing_zyx, origin_xyz, downsample, downsample_mode,
+                        prefer_int16, assume_safe, use_kernel=True):
+        """Steps 1-2 of set_volume (NumPy only, safe off the GUI thread).
+        Returns (vol, spacing_zyx, origin_xyz, step)."""
         # 1) downsample
+        #    stride: every f-th voxel (cheap, may alias)
+        #    block:  mean of each f x f x f block (one vectorized pass, no aliasing)
+        #    none:   keep the full array and let the ray caster step f voxels instead
         f = int(downsample) if downsample and downsample > 1 else 1
-        if f > 1:
+        step = 1.0
+        if f > 1 and downsample_mode == "stride":
             vol = vol_zyx[::f, ::f, ::f].copy(order="C")
             sp = (spacing_zyx[0] * f, spacing_zyx[1] * f, spacing_zyx[2] * f)
+        elif f > 1 and downsample_mode == "block" and min(vol_zyx.shape) >= f:
+            z, y, x = (n // f for n in vol_zyx.shape)
+            kernel = _block_mean_kernel.get() if use_kernel and vol_zyx.dtype.kind in "iu" else None
+            if kernel is not None:
+                vol = np.empty((z, y, x), dtype=vol_zyx.dtype)
+                kernel(vol_zyx, f, vol)
+            else:
+                blocks = vol_zyx[:z * f, :y * f, :x * f].reshape(z, f, y, f, x, f)
+                vol = blocks.mean(axis=(1, 3, 5), dtype=np.float32)
+                if vol_zyx.dtype.kind in "iu":
+                    vol = np.rint(vol, out=vol).astype(vol_zyx.dtype)
+            sp = (spacing_zyx[0] * f, spacing_zyx[1] * f, spacing_zyx[2] * f)
+            # the first sample now sits at the centre of the first block
+            shift = (f - 1) / 2.0
+            origin_xyz = (origin_xyz[0] + shift * spacing_zyx[2],
+                          origin_xyz[1] + shift * spacing_zyx[1],
+                          origin_xyz[2] + shift * spacing_zyx[0])
         else:
             vol = vol_zyx
             sp = spacing_zyx
-        print("[VTK] after downsample", vol.shape, sp)
+            if downsample_mode == "none":
+                step = float(f)
+        _debug("[VTK] after downsample", vol.shape, sp)
 
-        # 2) dtype
+        # 2) dtype: int16 as is; uint16 that fits is reinterpreted in place (assume_safe skips the
+        #    max() scan) and uint16 above 32767 stays uint16 rather than wrapping -- both keep a
+        #    2-byte/voxel 3D texture on the GPU; anything else is cast to int16
         if prefer_int16 and vol.dtype != np.int16:
-            vol = vol.astype(np.int16, copy=False)
-        print("[VTK] after dtype", str(vol.dtype))
+            if vol.dtype == np.uint16:
+                if assume_safe or int(vol.max()) < 32768:
+                    vol = vol.view(np.int16)
+            else:
+                vol = vol.astype(np.int16, order="C")
+        _debug("[VTK] after dtype", str(vol.dtype))
+
+        # VTK reads the flat buffer x-fastest, i.e. C order of (Z, Y, X). Made contiguous only
+        # here, so non-C input (F order, transposed views) is copied once at most: the downsample
+        # and the int16 cast above already write C-ordered output
+        if not vol.flags.c_contiguous:
+            vol = np.ascontiguousarray(vol)
+        return vol, sp, origin_xyz, step
+
+    def _show_volume(self, vol: np.ndarray, sp, origin_xyz, step: float, *, blending: str,
+                     quality: str, quantize: bool, z_frame):
+        self._z_frame = z_frame
+
+        # 2.5) quantize: window once on the CPU and upload 1 byte/voxel (for a WL/WW the UI has
+        #      locked; each later change re-quantizes). Reuse the uint8 buffer for the same shape
+        if quantize:
+            if self._q_buf is None or self._q_buf.shape != vol.shape:
+                self._q_buf = np.empty(vol.shape, dtype=np.uint8)
+            self._q_src = vol
+            self._quantize_into(vol, self._q_buf)
+            vol = self._q_buf
+        else:
+            self._q_src = self._q_buf = None
 
         # 3) numpy -> vtkImageData (XYZ order expected)
         z, y, x = vol.shape
         sx, sy, sz = float(sp[2]), float(sp[1]), float(sp[0])
         ox, oy, oz = [float(v) for v in origin_xyz]
+        gpu = os.environ.get("VIEWER_VTK_GPU", "1") != "0"
+        vtk_type = _VTK_TYPES.get(vol.dtype, vtk.VTK_FLOAT)
+        texture_bytes = vol.size * (vol.itemsize if vtk_type != vtk.VTK_FLOAT else 4)
+        bricked = gpu and texture_bytes > GPU_BUDGET_BYTES
 
-        vtk_img = vtkImageData()
-        vtk_img.SetDimensions(int(x), int(y), int(z))
-        vtk_img.SetSpacing(sx, sy, sz)
-        vtk_img.SetOrigin(ox, oy, oz)
-
-        arr = np.asfortranarray(vol.transpose(2, 1, 0)).ravel(order="F")
-        vtk_type = vtk.VTK_SHORT if vol.dtype == np.int16 else vtk.VTK_FLOAT
-        vtk_arr = numpy_to_vtk(arr, deep=True, array_type=vtk_type)
-        vtk_arr.SetName("values")
-        vtk_img.GetPointData().SetScalars(vtk_arr)
-        print("[VTK] vtk image ready")
+        # Same dimensions/type/geometry/mapper as the volume on screen: swap the scalars only and
+        # keep the image, mapper, volume and camera (no new pipeline, no ResetCamera)
+        vol_key = ((x, y, z), vtk_type, (sx, sy, sz), (ox, oy, oz), blending, gpu, step, quality)
+        if self._actor is not None and vol_key == self._vol_key and not bricked:
+            self._set_scalars(self._vtk_img, vol)
+            self._update_transfer_functions()
+            self._apply_slab()
+            _debug("[VTK] scalars replaced")
+            self.request_render()
+            return
 
-        # 4) transfer functions from WL/WW
-        low = float(self._wl - self._ww / 2.0)
-        high = float(self._wl + self._ww / 2.0)
-        ctf = vtkColorTransferFunction()
-        if self._photometric == "MONOCHROME1":
-            ctf.AddRGBPoint(low, 1.0, 1.0, 1.0)
-            ctf.AddRGBPoint(high, 0.0, 0.0, 0.0)
+        if bricked:
+            vtk_img = None
+            data = self._make_bricks(vol, (sx, sy, sz), (ox, oy, oz), GPU_BUDGET_BYTES)
+            _debug("[VTK] vtk bricks ready", data.GetNumberOfBlocks())
         else:
-            ctf.AddRGBPoint(low, 0.0, 0.0, 0.0)
-            ctf.AddRGBPoint(high, 1.0, 1.0, 1.0)
-        otf = vtkPiecewiseFunction()
-        otf.AddPoint(low, 0.0)
-        otf.AddPoint((low + high) / 2.0, 0.2)
-        otf.AddPoint(high, 1.0)
+            vtk_img = data = vtkImageData()
+            vtk_img.SetDimensions(int(x), int(y), int(z))
+            vtk_img.SetSpacing(sx, sy, sz)
+            vtk_img.SetOrigin(ox, oy, oz)
+            self._set_scalars(vtk_img, vol)
+            _debug("[VTK] vtk image ready")
 
+        # 4) transfer functions from WL/WW
+        self._update_transfer_functions()
         prop = vtkVolumeProperty()
-        prop.SetColor(ctf)
-        prop.SetScalarOpacity(otf)
+        prop.SetColor(self._ctf)
+        prop.SetScalarOpacity(self._otf)
         prop.ShadeOff()
         prop.SetInterpolationTypeToLinear()
 
-        # 4.5) choose mapper: default to CPU fixed-point on macOS to avoid GPU stalls
-        use_cpu = True
-        if os.environ.get("VIEWER_VTK_GPU", "0") == "1":
-            use_cpu = False
-        try:
-            if not use_cpu:
-                # Try GPU via SmartVolumeMapper
-                mapper = vtkSmartVolumeMapper()
-                mapper.SetInputData(vtk_img)
-                if blending == "mip":
-                    mapper.SetBlendModeToMaximumIntensity()
-                else:
-                    mapper.SetBlendModeToComposite()
-                try:
-                    mapper.SetRequestedRenderModeToGPU()
-                except Exception:
-                    pass
-                # coarse sampling for stability/perf
-                avg_voxel = float((sp[0] + sp[1] + sp[2]) / 3.0)
-                try:
-                    mapper.SetAutoAdjustSampleDistances(False)
-                    mapper.SetSampleDistance(max(avg_voxel * 5.0, 1.0))
-                except Exception:
-                    pass
-            else:
-                # CPU software mapper (very robust on macOS)
-                from vtkmodules.vtkRenderingVolume import vtkFixedPointVolumeRayCastMapper
-                mapper = vtkFixedPointVolumeRayCastMapper()
-                mapper.SetInputData(vtk_img)
-                if blending == "mip":
-                    mapper.SetBlendModeToMaximumIntensity()
-                else:
-                    mapper.SetBlendModeToComposite()
-        except Exception:
-            # last resort: fall back to SmartVolumeMapper default path
+        # 4.5) choose mapper: GPU ray casting through SmartVolumeMapper by default. Its default render
+        # mode picks the GPU path when supported and falls back to CPU ray casting on its own;
+        # VIEWER_VTK_GPU=0 forces the CPU fixed-point mapper (same switch as app.py). Volumes over
+        # the GPU budget stay on the GPU as bricks instead of dropping to CPU ray casting
+        if not gpu:
+            from vtkmodules.vtkRenderingVolume import vtkFixedPointVolumeRayCastMapper
+            mapper = vtkFixedPointVolumeRayCastMapper()
+        elif bricked:
+            mapper = vtkMultiBlockVolumeMapper()
+        else:
             mapper = vtkSmartVolumeMapper()
-            mapper.SetInputData(vtk_img)
-            if blending == "mip":
-                mapper.SetBlendModeToMaximumIntensity()
-            else:
-                mapper.SetBlendModeToComposite()
+            mapper.SetRequestedRenderModeToDefault()
+        if gpu and hasattr(mapper, "SetUseJittering"):  # VTK >= 9.1: hides banding from the ray step
+            mapper.SetUseJittering(True)
+        mapper.SetInputDataObject(data)
+        if blending == "mip":
+            mapper.SetBlendModeToMaximumIntensity()
+        else:
+            mapper.SetBlendModeToComposite()
+        # base ray step = the finest spacing (f voxels for downsample_mode="none"), so thin
+        # structures along any axis are not skipped; VTK coarsens it on its own while dragging.
+        # quality="fast" halves the work: every other image ray on the CPU mapper (which
+        # interpolates the rest, up to 4 while interacting), a double ray step on SmartVolumeMapper
+        min_voxel = float(min(sp))
+        # (vtkMultiBlockVolumeMapper has neither knob: its per-brick mappers pick their own step)
+        if hasattr(mapper, "SetImageSampleDistance"):
+            mapper.SetAutoAdjustSampleDistances(True)
+            mapper.SetSampleDistance(min_voxel * step)
+            mapper.SetImageSampleDistance(2.0 if quality == "fast" else 1.0)
+            mapper.SetMaximumImageSampleDistance(4.0)
+        elif hasattr(mapper, "SetSampleDistance"):
+            mapper.SetAutoAdjustSampleDistances(True)
+            mapper.SetSampleDistance(min_voxel * step * (2.0 if quality == "fast" else 1.0))
 
         volume = vtkVolume()
         volume.SetMapper(mapper)
         volume.SetProperty(prop)
 
-        # Debug axes to verify scene renders even if volume is invisible
-        try:
-            from vtkmodules.vtkRenderingAnnotation import vtkAxesActor
-            axes = vtkAxesActor()
-            axes.SetTotalLength(50, 50, 50)
-            self.ren.AddActor(axes)
-        except Exception:
-            pass
-
-        # 5) render (synchronous, onscreen)
+        # 5) render (deferred, onscreen)
         try:
             self.ren.RemoveAllViewProps()
         except Exception:
             pass
-        self.ren.AddVolume(volume)
-        self._actor = volume
-        self.ren.ResetCamera()
-        try:
-            # Ensure onscreen rendering
+        if DEBUG:
+            # Debug axes to verify scene renders even if volume is invisible
             try:
-                self.ren_win.SetOffScreenRendering(False)
+                from vtkmodules.vtkRenderingAnnotation import vtkAxesActor
+                axes = vtkAxesActor()
+                axes.SetTotalLength(50, 50, 50)
+                self.ren.AddActor(axes)
             except Exception:
                 pass
-            self.ren_win.Render()
-        except Exception as e:
-            print("[VTK] render skipped:", e)
-        from PySide6.QtWidgets import QApplication
+        self.ren.AddVolume(volume)
+        self._actor = volume
+        self._vtk_img = vtk_img
+        self._vtk_data = data
+        self._vol_key = vol_key
+        self._apply_slab()
+        bounds = tuple(round(v, 6) for v in mapper.GetBounds())
+        if bounds != self._camera_bounds:
+            self.ren.ResetCamera()
+            self._camera_bounds = bounds
+        # Ensure onscreen rendering
         try:
-            QApplication.processEvents()
-            self.vtk_widget.update()
-            self.vtk_widget.repaint()
+            self.ren_win.SetOffScreenRendering(False)
         except Exception:
             pass
-        print("[VTK] end render (vtk native)")
\ No newline at end of file
+        self.request_render()
+        _debug("[VTK] render scheduled (vtk native)")
\ No newline at end of file